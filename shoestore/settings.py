@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/6.0/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -48,6 +49,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'shop.profiling.ProfilingMiddleware',
 ]
 
 ROOT_URLCONF = 'shoestore.urls'
@@ -81,6 +83,65 @@ DATABASES = {
 }
 
 
+# Caches and sessions
+# https://docs.djangoproject.com/en/6.0/topics/cache/
+
+# The default cache holds the data version numbers that tell every worker
+# process (and management commands) to rebuild its in-memory indexes, so it
+# must be shared between processes: Redis when SHOP_REDIS_URL is set
+# (requires the redis package), otherwise a file-based cache in SHOP_CACHE_DIR
+# that all processes on this host see
+SHOP_REDIS_URL = os.environ.get('SHOP_REDIS_URL')
+SHOP_CACHE_DIR = Path(os.environ.get('SHOP_CACHE_DIR', BASE_DIR / 'cache'))
+
+if SHOP_REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': SHOP_REDIS_URL,
+        },
+        'sessions': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': SHOP_REDIS_URL,
+            'KEY_PREFIX': 'sessions',
+        },
+        'throttle': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': SHOP_REDIS_URL,
+            'KEY_PREFIX': 'throttle',
+        },
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': SHOP_CACHE_DIR / 'default',
+            'OPTIONS': {'MAX_ENTRIES': 10000},
+        },
+        'sessions': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': SHOP_CACHE_DIR / 'sessions',
+            'OPTIONS': {'MAX_ENTRIES': 10000},
+        },
+        'throttle': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': SHOP_CACHE_DIR / 'throttle',
+            'OPTIONS': {'MAX_ENTRIES': 10000},
+        },
+    }
+
+# Sessions are read from the 'sessions' cache with the database as the source
+# of truth; see SHOP_SESSION_DB_WRITE_INTERVAL and shop/sessions.py. Login
+# throttle counters get their own 'throttle' cache so that page cache entries
+# cannot evict them
+SESSION_ENGINE = 'shop.sessions'
+SESSION_CACHE_ALIAS = 'sessions'
+
+# Tests run with process-local caches so that they never clear the shared
+# caches of a running server (see shop/tests/runner.py)
+TEST_RUNNER = 'shop.tests.runner.IsolatedCacheRunner'
+
+
 # Password validation
 # https://docs.djangoproject.com/en/6.0/ref/settings/#auth-password-validators
 
@@ -99,6 +160,14 @@ AUTH_PASSWORD_VALIDATORS = [
     },
 ]
 
+# The first hasher is used for new hashes; stored hashes with another
+# algorithm or iteration count are rehashed on the next successful login
+PASSWORD_HASHERS = [
+    'shop.hashers.PBKDF2PasswordHasher',
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+    'django.contrib.auth.hashers.ScryptPasswordHasher',
+]
+
 
 # Internationalization
 # https://docs.djangoproject.com/en/6.0/topics/i18n/
@@ -119,3 +188,90 @@ STATIC_URL = 'static/'
 
 MEDIA_URL = 'media/'
 MEDIA_ROOT = BASE_DIR / 'media'
+
+
+# Shop settings
+
+# Offline geocode table (CSV: postcode, latitude, longitude) used when
+# importing delivery points
+SHOP_GEOCODE_TABLE = BASE_DIR / 'import' / 'geocode.csv'
+
+# Grid cell size of the delivery point spatial index, km
+SHOP_SPATIAL_INDEX_CELL_KM = 50
+
+# How many nearest delivery points are listed first in the order form
+SHOP_NEAREST_DELIVERY_POINTS = 10
+
+# How many "frequently bought together" products are kept per product
+SHOP_RECOMMENDATIONS_TOP_K = 5
+
+# Incremental co-occurrence updates from new orders reach the in-memory
+# recommendation index at most this often, seconds (a full rebuild by the
+# build_recommendations command is picked up immediately)
+SHOP_RECOMMENDATIONS_REFRESH_SECONDS = 300
+
+# Replenishment report: sales velocity windows (days), window used for the
+# forecast, supplier lead time, how many days of sales to reorder for, and
+# how long the manager page keeps a computed report
+SHOP_REPLENISHMENT_WINDOWS = (7, 30, 90)
+SHOP_REPLENISHMENT_VELOCITY_WINDOW = 30
+SHOP_REPLENISHMENT_LEAD_TIME_DAYS = 14
+SHOP_REPLENISHMENT_COVER_DAYS = 30
+SHOP_REPLENISHMENT_CACHE_SECONDS = 600
+
+# Admin changelists of unfiltered tables larger than this use the planner's
+# row estimate instead of an exact COUNT(*)
+SHOP_ESTIMATED_COUNT_THRESHOLD = 10000
+
+# Lookup tables (categories, manufacturers, suppliers, delivery points) with
+# more rows than this are rendered as search-as-you-type inputs in forms
+SHOP_CHOICES_AUTOCOMPLETE_THRESHOLD = 200
+
+# Full-page cache of the anonymous guest catalogue: seconds a page is fresh,
+# and how long after that a stale page is still served while it is rebuilt
+SHOP_GUEST_CATALOGUE_MAX_AGE = 60
+SHOP_GUEST_CATALOGUE_STALE = 600
+
+# Completed and cancelled orders older than this many days are moved to the
+# archive tables by the archive_orders command
+SHOP_ARCHIVE_AFTER_DAYS = 365
+
+# Pending orders not picked up this many days after delivery_date are
+# cancelled by the expire_orders command
+SHOP_ORDER_EXPIRE_AFTER_DAYS = 14
+
+# Opt-in request profiler: profiles SAMPLE_RATE of requests, or staff requests
+# carrying a signed X-Shop-Profile header (see the profile_token command), and
+# keeps the last MAX_FILES_PER_VIEW profiles per URL name in DIR
+SHOP_PROFILING = {
+    'ENABLED': False,
+    'SAMPLE_RATE': 0.01,
+    'DIR': BASE_DIR / 'profiles',
+    'MAX_FILES_PER_VIEW': 50,
+}
+
+# Photo renditions built by the ingest_photos command from the originals:
+# thumbnail size, Pillow format, encoder quality and directory under
+# MEDIA_ROOT. The 'photo' rendition is the one stored in Product.photo; add
+# entries (e.g. a WEBP copy) to generate more formats
+SHOP_PHOTO_RENDITIONS = {
+    'photo': {'size': (300, 200), 'format': 'JPEG', 'quality': 85, 'dir': 'products'},
+}
+
+# Seconds between database writes of a modified session (0 writes every change).
+# Changes made inside the interval live only in the cache until the next save
+# after it, so write-behind is enabled only with Redis; the file-based cache
+# culls entries and would lose them
+SHOP_SESSION_DB_WRITE_INTERVAL = 60 if SHOP_REDIS_URL else 0
+
+# Failed logins allowed per client IP and per username within WINDOW seconds;
+# further attempts are rejected before the password is checked
+SHOP_LOGIN_THROTTLE = {
+    'IP_LIMIT': 20,
+    'USERNAME_LIMIT': 5,
+    'WINDOW': 300,
+    'CACHE': 'throttle',
+}
+
+# PBKDF2 iterations for password hashes (None keeps the Django default)
+SHOP_PASSWORD_ITERATIONS = None
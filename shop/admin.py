@@ -1,8 +1,11 @@
 from django.contrib import admin
 from .models import (
     Category, Manufacturer, Supplier, Product,
-    UserProfile, DeliveryPoint, Order, OrderItem
+    UserProfile, DeliveryPoint, Order, OrderItem,
+    ArchivedOrder, ArchivedOrderItem
 )
+from .paginator import EstimatedCountPaginator
+from .totals import TOTAL_FIELDS
 
 
 @admin.register(Category)
@@ -27,32 +30,74 @@ class SupplierAdmin(admin.ModelAdmin):
 class ProductAdmin(admin.ModelAdmin):
     list_display = ('article', 'name', 'price', 'quantity', 'discount', 'category')
     list_filter = ('category', 'supplier', 'manufacturer')
+    list_select_related = ('category',)
     search_fields = ('article', 'name', 'description')
     readonly_fields = ('article',)
+    autocomplete_fields = ('supplier', 'manufacturer', 'category')
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
 
 
 @admin.register(UserProfile)
 class UserProfileAdmin(admin.ModelAdmin):
     list_display = ('full_name', 'role', 'user')
     list_filter = ('role',)
+    list_select_related = ('user',)
     search_fields = ('full_name', 'user__username')
 
 
 @admin.register(DeliveryPoint)
 class DeliveryPointAdmin(admin.ModelAdmin):
-    list_display = ('address',)
-    search_fields = ('address',)
+    list_display = ('address', 'postcode', 'latitude', 'longitude')
+    search_fields = ('address', 'postcode')
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
 
 
 class OrderItemInline(admin.TabularInline):
     model = OrderItem
     extra = 1
+    autocomplete_fields = ('product',)
+    readonly_fields = ('unit_price', 'discount', 'line_total')
+    
+    def get_queryset(self, request):
+        # __str__ позиции обращается к заказу и названию товара
+        return super().get_queryset(request).select_related('order', 'product')
 
 
 @admin.register(Order)
 class OrderAdmin(admin.ModelAdmin):
-    list_display = ('order_number', 'customer_name', 'order_date', 'status')
+    list_display = ('order_number', 'customer_name', 'order_date', 'status', 'total_units', 'total_net')
     list_filter = ('status', 'order_date')
     search_fields = ('order_number', 'customer_name')
     inlines = [OrderItemInline]
-    readonly_fields = ('order_number',)
+    readonly_fields = ('order_number',) + TOTAL_FIELDS
+    autocomplete_fields = ('delivery_point',)
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+
+class ArchivedOrderItemInline(admin.TabularInline):
+    model = ArchivedOrderItem
+    extra = 0
+    can_delete = False
+    readonly_fields = ('product', 'quantity', 'unit_price', 'discount', 'line_total')
+    
+    def has_add_permission(self, request, obj=None):
+        return False
+    
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('order', 'product')
+
+
+@admin.register(ArchivedOrder)
+class ArchivedOrderAdmin(admin.ModelAdmin):
+    list_display = ('order_number', 'customer_name', 'order_date', 'status', 'total_net', 'archived_at')
+    list_filter = ('status', 'order_date')
+    search_fields = ('order_number', 'customer_name')
+    inlines = [ArchivedOrderItemInline]
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    
+    def has_change_permission(self, request, obj=None):
+        return False
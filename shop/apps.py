@@ -3,3 +3,6 @@ from django.apps import AppConfig
 
 class ShopConfig(AppConfig):
     name = 'shop'
+    
+    def ready(self):
+        from . import checks, signals  # noqa: F401
@@ -0,0 +1,92 @@
+"""Архивирование старых заказов
+
+Завершенные и отмененные заказы старше SHOP_ARCHIVE_AFTER_DAYS вместе
+с позициями переносятся в таблицы ArchivedOrder/ArchivedOrderItem, чтобы
+рабочие таблицы заказов оставались маленькими. Перенос идет пакетами,
+каждый пакет - отдельная транзакция, поэтому прерванный запуск можно
+просто повторить: он продолжит с оставшихся заказов. Список заказов
+читает архив, если период фильтра захватывает даты архивных заказов
+(см. newest_archived_date).
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from .models import Order, OrderItem, ArchivedOrder, ArchivedOrderItem
+
+
+ARCHIVABLE_STATUSES = ('completed', 'cancelled')
+
+NEWEST_ARCHIVED_KEY = 'shop:archive:newest'
+
+ORDER_FIELDS = (
+    'id', 'order_number', 'order_date', 'delivery_date', 'delivery_point_id',
+    'customer_name', 'code', 'status',
+    'total_items', 'total_units', 'total_gross', 'total_discount', 'total_net',
+)
+ITEM_FIELDS = ('id', 'order_id', 'product_id', 'quantity', 'unit_price', 'discount', 'line_total')
+
+
+def archive_after_days():
+    return getattr(settings, 'SHOP_ARCHIVE_AFTER_DAYS', 365)
+
+
+def newest_archived_date():
+    """Дата самого нового заказа в архиве (None, если архив пуст)"""
+    newest = cache.get(NEWEST_ARCHIVED_KEY)
+    if newest is None:
+        newest = ArchivedOrder.objects.aggregate(newest=Max('order_date'))['newest'] or False
+        cache.set(NEWEST_ARCHIVED_KEY, newest, None)
+    return newest or None
+
+
+def archivable_orders(cutoff):
+    return Order.objects.filter(
+        status__in=ARCHIVABLE_STATUSES, order_date__lt=cutoff
+    ).order_by('order_date', 'id')
+
+
+def archive_batch(cutoff, batch_size):
+    """Перенести в архив один пакет заказов, вернуть (заказов, позиций)"""
+    with transaction.atomic():
+        orders = list(archivable_orders(cutoff).values(*ORDER_FIELDS)[:batch_size])
+        if not orders:
+            return 0, 0
+        ids = [order['id'] for order in orders]
+        items = list(OrderItem.objects.filter(order_id__in=ids).values(*ITEM_FIELDS))
+
+        # Конфликт (например, номер заказа уже есть в архиве) откатывает весь пакет
+        ArchivedOrder.objects.bulk_create([ArchivedOrder(**order) for order in orders])
+        ArchivedOrderItem.objects.bulk_create([ArchivedOrderItem(**item) for item in items])
+        # Позиции удаляются каскадом вместе с заказами, без пересчета итогов
+        Order.objects.filter(id__in=ids).delete()
+    cache.delete(NEWEST_ARCHIVED_KEY)
+    return len(orders), len(items)
+
+
+def archive_orders(days=None, batch_size=500, max_batches=None, now=None):
+    """Архивировать заказы пакетами; генератор возвращает итог каждого пакета"""
+    if days is None:
+        days = archive_after_days()
+    cutoff = (now or timezone.now()) - timedelta(days=days)
+    batches = 0
+    while max_batches is None or batches < max_batches:
+        orders, items = archive_batch(cutoff, batch_size)
+        if not orders:
+            return
+        batches += 1
+        yield orders, items
+
+
+def archived_orders_between(date_from=None, date_to=None):
+    """Архивные заказы за период (для прозрачного чтения из архива)"""
+    orders = ArchivedOrder.objects.select_related('delivery_point').prefetch_related('items__product')
+    if date_from:
+        orders = orders.filter(order_date__gte=date_from)
+    if date_to:
+        orders = orders.filter(order_date__lt=date_to)
+    return orders.order_by('-order_date')
@@ -0,0 +1,36 @@
+import time
+
+from django.core.cache import cache
+
+
+VERSION_KEY_PREFIX = 'shop:version:'
+
+# Версия каталога: товары и их справочники (для кеша страниц каталога)
+CATALOGUE_VERSION = 'catalogue'
+
+
+def _initial_version():
+    # Начальная версия зависит от времени, чтобы после вытеснения ключа
+    # из кеша не вернуться к уже использованному номеру
+    return time.time_ns()
+
+
+def get_version(name):
+    """Получить текущую версию набора данных (для инвалидации кешей)"""
+    key = VERSION_KEY_PREFIX + name
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, _initial_version(), timeout=None)
+        version = cache.get(key)
+    return version
+
+
+def bump_version(name):
+    """Увеличить версию набора данных после изменения"""
+    key = VERSION_KEY_PREFIX + name
+    try:
+        return cache.incr(key)
+    except ValueError:
+        version = _initial_version()
+        cache.set(key, version, timeout=None)
+        return version
@@ -0,0 +1,38 @@
+from django.conf import settings
+from django.core.checks import Warning, register
+
+
+PROCESS_LOCAL_BACKENDS = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+
+@register()
+def check_shared_cache(app_configs, **kwargs):
+    """Версии данных должны храниться в кеше, общем для всех процессов"""
+    backend = settings.CACHES.get('default', {}).get('BACKEND', '')
+    if backend in PROCESS_LOCAL_BACKENDS:
+        return [Warning(
+            'Кеш по умолчанию не общий для процессов: команды управления и другие '
+            'процессы сервера не увидят новые версии данных, индексы и страницы '
+            'останутся устаревшими до перезапуска.',
+            hint='Используйте Redis (SHOP_REDIS_URL), файловый кеш или кеш в БД.',
+            id='shop.W001',
+        )]
+    return []
+
+
+@register()
+def check_session_write_behind(app_configs, **kwargs):
+    """Отложенная запись сессий допустима только при общем кеше сессий"""
+    alias = getattr(settings, 'SESSION_CACHE_ALIAS', 'default')
+    backend = settings.CACHES.get(alias, {}).get('BACKEND', '')
+    if getattr(settings, 'SHOP_SESSION_DB_WRITE_INTERVAL', 0) and backend in PROCESS_LOCAL_BACKENDS:
+        return [Warning(
+            'Отложенная запись сессий включена, но кеш сессий не общий для процессов: '
+            'изменения сессии, еще не записанные в БД, теряются и не видны другим процессам.',
+            hint='Используйте Redis для кеша сессий или SHOP_SESSION_DB_WRITE_INTERVAL = 0.',
+            id='shop.W002',
+        )]
+    return []
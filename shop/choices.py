@@ -0,0 +1,163 @@
+"""Кешируемые списки выбора для справочников
+
+Списки (id, название) категорий, производителей, поставщиков и пунктов
+выдачи держатся в памяти процесса и перечитываются только после изменения
+версии справочника (версию увеличивают сигналы при сохранении/удалении).
+Если справочник больше порога SHOP_CHOICES_AUTOCOMPLETE_THRESHOLD, в формах
+вместо <select> выводится поле с поиском по мере ввода через JSON-запрос.
+"""
+import threading
+
+from django import forms
+from django.conf import settings
+from django.forms.models import ModelChoiceIterator
+from django.urls import reverse
+
+from .cache import get_version
+from .geo import DELIVERY_POINTS_VERSION
+
+
+class ChoiceProvider:
+    """Список выбора одного справочника с кешем в памяти процесса"""
+
+    def __init__(self, name, model_path, label_field, version_name=None):
+        self.name = name
+        self.model_path = model_path
+        self.label_field = label_field
+        self.version_name = version_name or f'choices:{name}'
+        self._choices = None
+        self._labels = None
+        self._version = None
+        self._lock = threading.Lock()
+
+    @property
+    def model(self):
+        from django.apps import apps
+        return apps.get_model(self.model_path)
+
+    def choices(self):
+        """Кортеж (id, название), отсортированный по названию"""
+        version = get_version(self.version_name)
+        if self._choices is not None and self._version == version:
+            return self._choices
+        with self._lock:
+            if self._choices is None or self._version != version:
+                self._choices = tuple(
+                    self.model.objects.order_by(self.label_field, 'pk')
+                    .values_list('pk', self.label_field)
+                )
+                self._labels = dict(self._choices)
+                self._version = version
+        return self._choices
+
+    def label(self, pk):
+        self.choices()
+        try:
+            return self._labels.get(int(pk))
+        except (TypeError, ValueError):
+            return None
+
+    def search(self, query, limit=20):
+        """Поиск по подстроке в названии"""
+        query = query.strip().lower()
+        result = []
+        for pk, label in self.choices():
+            if query in label.lower():
+                result.append((pk, label))
+                if len(result) >= limit:
+                    break
+        return result
+
+    def use_autocomplete(self):
+        threshold = getattr(settings, 'SHOP_CHOICES_AUTOCOMPLETE_THRESHOLD', 200)
+        return len(self.choices()) > threshold
+
+
+PROVIDERS = {
+    provider.name: provider
+    for provider in (
+        ChoiceProvider('category', 'shop.Category', 'name'),
+        ChoiceProvider('manufacturer', 'shop.Manufacturer', 'name'),
+        ChoiceProvider('supplier', 'shop.Supplier', 'name'),
+        ChoiceProvider('delivery_point', 'shop.DeliveryPoint', 'address', DELIVERY_POINTS_VERSION),
+    )
+}
+
+
+def get_provider(name):
+    return PROVIDERS.get(name)
+
+
+def provider_for_model(model):
+    for provider in PROVIDERS.values():
+        if provider.model_path.lower() == model._meta.label_lower:
+            return provider
+    return None
+
+
+class CachedModelChoiceIterator(ModelChoiceIterator):
+    """Варианты выбора из кеша провайдера вместо запроса к БД"""
+
+    def __iter__(self):
+        if self.field.empty_label is not None:
+            yield ('', self.field.empty_label)
+        choices = self.field.provider.choices()
+        priority = self.field.priority
+        if priority:
+            # Приоритетные варианты (например, ближайшие пункты) идут первыми
+            labels = dict(choices)
+            first = [(pk, labels[pk]) for pk in priority if pk in labels]
+            taken = set(priority)
+            choices = first + [choice for choice in choices if choice[0] not in taken]
+        yield from choices
+
+    def __len__(self):
+        return len(self.field.provider.choices()) + (self.field.empty_label is not None)
+
+    def __bool__(self):
+        return self.field.empty_label is not None or bool(self.field.provider.choices())
+
+
+class AutocompleteInput(forms.Widget):
+    """Поле с поиском по мере ввода для больших справочников"""
+    template_name = 'shop/widgets/autocomplete.html'
+
+    def __init__(self, provider, attrs=None):
+        super().__init__(attrs)
+        self.provider = provider
+
+    def get_context(self, name, value, attrs):
+        context = super().get_context(name, value, attrs)
+        context['widget']['label'] = self.provider.label(value) if value not in (None, '') else ''
+        context['widget']['url'] = reverse('shop:lookup', args=[self.provider.name])
+        return context
+
+
+class CachedModelChoiceField(forms.ModelChoiceField):
+    """Выбор из справочника, варианты которого берутся из кеша процесса"""
+    iterator = CachedModelChoiceIterator
+
+    def __init__(self, queryset, **kwargs):
+        super().__init__(queryset, **kwargs)
+        self.provider = provider_for_model(queryset.model)
+        self.priority = []
+
+    def __deepcopy__(self, memo):
+        result = super().__deepcopy__(memo)
+        result.priority = list(self.priority)
+        return result
+
+    def prepare_widget(self):
+        """Переключить <select> на поиск по мере ввода, если справочник большой"""
+        if self.provider.use_autocomplete():
+            self.widget = AutocompleteInput(self.provider, attrs=self.widget.attrs)
+
+
+class CachedChoicesMixin:
+    """Форма, в которой справочники выводятся из кеша"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        for field in self.fields.values():
+            if isinstance(field, CachedModelChoiceField):
+                field.prepare_widget()
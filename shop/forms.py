@@ -1,15 +1,23 @@
 from django import forms
-from .models import Product, Order, OrderItem, Category, Manufacturer, Supplier, DeliveryPoint
+from django.conf import settings
+from .choices import CachedChoicesMixin, CachedModelChoiceField
+from .geo import nearest_delivery_points
+from .models import Product, Order, OrderItem, Category, Manufacturer, Supplier, DeliveryPoint, ArchivedOrder
 from PIL import Image
 
 
-class ProductForm(forms.ModelForm):
+class ProductForm(CachedChoicesMixin, forms.ModelForm):
     """Форма для добавления/редактирования товара"""
     
     class Meta:
         model = Product
         fields = ['article', 'name', 'unit', 'price', 'supplier', 'manufacturer', 
                   'category', 'discount', 'quantity', 'description', 'photo']
+        field_classes = {
+            'supplier': CachedModelChoiceField,
+            'manufacturer': CachedModelChoiceField,
+            'category': CachedModelChoiceField,
+        }
         widgets = {
             'article': forms.TextInput(attrs={'class': 'form-control', 'placeholder': 'Артикул'}),
             'name': forms.TextInput(attrs={'class': 'form-control', 'placeholder': 'Наименование'}),
@@ -59,13 +67,16 @@ class ProductForm(forms.ModelForm):
         return instance
 
 
-class OrderForm(forms.ModelForm):
+class OrderForm(CachedChoicesMixin, forms.ModelForm):
     """Форма для добавления/редактирования заказа"""
     
     class Meta:
         model = Order
         fields = ['order_number', 'order_date', 'delivery_date', 'delivery_point', 
                   'customer_name', 'code', 'status']
+        field_classes = {
+            'delivery_point': CachedModelChoiceField,
+        }
         widgets = {
             'order_number': forms.NumberInput(attrs={'class': 'form-control', 'placeholder': 'Номер заказа'}),
             'order_date': forms.DateTimeInput(attrs={'class': 'form-control', 'type': 'datetime-local'}),
@@ -75,6 +86,23 @@ class OrderForm(forms.ModelForm):
             'code': forms.NumberInput(attrs={'class': 'form-control', 'placeholder': 'Код получения'}),
             'status': forms.Select(attrs={'class': 'form-control'}),
         }
+    
+    def __init__(self, *args, near=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        
+        # Ближайшие к указанному месту пункты выдачи показываем первыми
+        if near:
+            limit = getattr(settings, 'SHOP_NEAREST_DELIVERY_POINTS', 10)
+            self.fields['delivery_point'].priority = [
+                point_id for point_id, _ in nearest_delivery_points(limit, **near)
+            ]
+    
+    def clean_order_number(self):
+        order_number = self.cleaned_data.get('order_number')
+        # Номер не должен совпадать с номером заказа, перенесенного в архив
+        if ArchivedOrder.objects.filter(order_number=order_number).exists():
+            raise forms.ValidationError('Заказ с таким номером уже существует в архиве')
+        return order_number
 
 
 class OrderItemForm(forms.ModelForm):
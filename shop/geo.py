@@ -0,0 +1,217 @@
+import csv
+import functools
+import heapq
+import math
+import re
+import threading
+
+from django.conf import settings
+
+from .cache import get_version
+
+
+EARTH_RADIUS_KM = 6371.0088
+POSTCODE_RE = re.compile(r'\b(\d{6})\b')
+
+# Имя версии набора пунктов выдачи (увеличивается сигналами при изменении)
+DELIVERY_POINTS_VERSION = 'delivery_points'
+
+
+def parse_postcode(address):
+    """Извлечь почтовый индекс из адреса"""
+    match = POSTCODE_RE.search(address or '')
+    return match.group(1) if match else ''
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    """Расстояние по дуге большого круга в километрах"""
+    lat1, lon1, lat2, lon2 = map(math.radians, (lat1, lon1, lat2, lon2))
+    a = (math.sin((lat2 - lat1) / 2) ** 2
+         + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2)
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+def _to_unit_vector(lat, lon):
+    lat, lon = math.radians(lat), math.radians(lon)
+    return (math.cos(lat) * math.cos(lon), math.cos(lat) * math.sin(lon), math.sin(lat))
+
+
+def _chord_to_km(chord):
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, chord / 2))
+
+
+class GeocodeTable:
+    """Офлайн-таблица геокодирования: почтовый индекс -> координаты
+
+    CSV-файл с колонками postcode, latitude, longitude. Если точного индекса
+    нет, используется центр отделения по первым трем цифрам (если он есть
+    в таблице в виде строки с трехзначным индексом).
+    """
+
+    def __init__(self, rows=()):
+        self._coords = {}
+        for postcode, lat, lon in rows:
+            self._coords[str(postcode).strip()] = (float(lat), float(lon))
+
+    @classmethod
+    def from_csv(cls, path):
+        with open(path, newline='', encoding='utf-8') as f:
+            reader = csv.DictReader(f)
+            return cls((row['postcode'], row['latitude'], row['longitude']) for row in reader)
+
+    @classmethod
+    def from_settings(cls):
+        path = getattr(settings, 'SHOP_GEOCODE_TABLE', None)
+        if not path:
+            return cls()
+        try:
+            return cls.from_csv(path)
+        except FileNotFoundError:
+            return cls()
+
+    def __len__(self):
+        return len(self._coords)
+
+    def lookup(self, postcode):
+        """Координаты (lat, lon) для индекса или None"""
+        postcode = (postcode or '').strip()
+        if not postcode:
+            return None
+        return self._coords.get(postcode) or self._coords.get(postcode[:3])
+
+    def geocode(self, address):
+        return self.lookup(parse_postcode(address))
+
+
+class SpatialIndex:
+    """Сеточный пространственный индекс для поиска ближайших точек
+
+    Точки переводятся в единичные векторы на сфере, поэтому евклидово
+    расстояние между ними (хорда) монотонно расстоянию по поверхности,
+    и поиск по кольцам ячеек сетки дает точный результат.
+    """
+
+    def __init__(self, points, cell_km=None):
+        # points - итерируемое из (key, latitude, longitude)
+        if cell_km is None:
+            cell_km = getattr(settings, 'SHOP_SPATIAL_INDEX_CELL_KM', 50)
+        self.cell = 2 * math.sin(cell_km / EARTH_RADIUS_KM / 2)
+        self._cells = {}
+        self._size = 0
+        for key, lat, lon in points:
+            vector = _to_unit_vector(lat, lon)
+            self._cells.setdefault(self._cell_of(vector), []).append((key, vector))
+            self._size += 1
+
+    def __len__(self):
+        return self._size
+
+    def _cell_of(self, vector):
+        return tuple(math.floor(c / self.cell) for c in vector)
+
+    def nearest(self, latitude, longitude, n=5):
+        """Список из n ближайших точек: [(key, расстояние_км), ...]"""
+        n = min(n, self._size)
+        if n <= 0:
+            return []
+        query = _to_unit_vector(latitude, longitude)
+        cx, cy, cz = self._cell_of(query)
+        heap = []  # max-heap по расстоянию: (-chord, порядковый номер, key)
+        seen = 0
+        radius = 0
+        while True:
+            ring = self._ring(cx, cy, cz, radius)
+            if ring is None:
+                # Кольцо стало больше числа занятых ячеек - дешевле досмотреть все
+                for cell, items in self._cells.items():
+                    if max(abs(cell[0] - cx), abs(cell[1] - cy), abs(cell[2] - cz)) >= radius:
+                        seen += self._push(heap, n, query, items, seen)
+                break
+            for cell in ring:
+                items = self._cells.get(cell)
+                if items:
+                    seen += self._push(heap, n, query, items, seen)
+            # Все точки вне просмотренных колец находятся не ближе radius * cell
+            if len(heap) == n and -heap[0][0] <= radius * self.cell:
+                break
+            if seen >= self._size:
+                break
+            radius += 1
+        result = sorted((-chord, order, key) for chord, order, key in heap)
+        return [(key, _chord_to_km(chord)) for chord, order, key in result]
+
+    def _push(self, heap, n, query, items, offset):
+        for i, (key, vector) in enumerate(items):
+            chord = math.dist(query, vector)
+            entry = (-chord, offset + i, key)
+            if len(heap) < n:
+                heapq.heappush(heap, entry)
+            elif entry[0] > heap[0][0]:
+                heapq.heapreplace(heap, entry)
+        return len(items)
+
+    def _ring(self, cx, cy, cz, radius):
+        if radius == 0:
+            return [(cx, cy, cz)]
+        side = 2 * radius + 1
+        if side ** 3 - (side - 2) ** 3 > len(self._cells):
+            return None
+        return [
+            (cx + dx, cy + dy, cz + dz)
+            for dx in range(-radius, radius + 1)
+            for dy in range(-radius, radius + 1)
+            for dz in range(-radius, radius + 1)
+            if max(abs(dx), abs(dy), abs(dz)) == radius
+        ]
+
+
+@functools.lru_cache(maxsize=1)
+def get_geocode_table():
+    """Таблица геокодирования из настроек (загружается один раз на процесс)"""
+    return GeocodeTable.from_settings()
+
+
+_index = None
+_index_version = None
+_index_lock = threading.Lock()
+
+
+def get_delivery_point_index():
+    """Индекс пунктов выдачи, перестраивается после изменения любого пункта"""
+    global _index, _index_version
+    from .models import DeliveryPoint
+
+    version = get_version(DELIVERY_POINTS_VERSION)
+    if _index is not None and _index_version == version:
+        return _index
+    with _index_lock:
+        if _index is None or _index_version != version:
+            points = DeliveryPoint.objects.filter(
+                latitude__isnull=False, longitude__isnull=False
+            ).values_list('id', 'latitude', 'longitude')
+            _index = SpatialIndex(points)
+            _index_version = version
+    return _index
+
+
+def resolve_location(postcode=None, latitude=None, longitude=None):
+    """Координаты по явно заданной точке или по почтовому индексу"""
+    if latitude is not None and longitude is not None:
+        return float(latitude), float(longitude)
+    if postcode:
+        from .models import DeliveryPoint
+
+        # Сначала ищем среди уже геокодированных пунктов, затем в таблице
+        point = DeliveryPoint.objects.filter(
+            postcode=postcode, latitude__isnull=False
+        ).values_list('latitude', 'longitude').first()
+        return point or get_geocode_table().lookup(postcode)
+    return None
+
+
+def nearest_delivery_points(n=5, postcode=None, latitude=None, longitude=None):
+    """Ближайшие n пунктов выдачи к точке или почтовому индексу: [(id, км), ...]"""
+    location = resolve_location(postcode, latitude, longitude)
+    if location is None:
+        return []
+    return get_delivery_point_index().nearest(location[0], location[1], n)
@@ -0,0 +1,17 @@
+"""Хешер паролей с настраиваемой стоимостью
+
+Число итераций PBKDF2 задается настройкой SHOP_PASSWORD_ITERATIONS (по
+умолчанию - значение Django). Алгоритм остается pbkdf2_sha256, поэтому
+старые хеши продолжают проверяться, а при следующем успешном входе Django
+сам пересчитывает хеш с текущим числом итераций.
+"""
+from django.conf import settings
+from django.contrib.auth import hashers
+
+
+class PBKDF2PasswordHasher(hashers.PBKDF2PasswordHasher):
+    """PBKDF2-SHA256 с числом итераций из настроек"""
+
+    @property
+    def iterations(self):
+        return getattr(settings, 'SHOP_PASSWORD_ITERATIONS', None) or super().iterations
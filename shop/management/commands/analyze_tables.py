@@ -0,0 +1,31 @@
+from django.apps import apps
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from shop.paginator import estimate_row_count
+
+
+class Command(BaseCommand):
+    help = ('Обновить статистику СУБД (ANALYZE) для таблиц магазина. Оценка числа строк '
+            'в админке (EstimatedCountPaginator) берется из этой статистики; запускайте '
+            'команду по расписанию, например раз в сутки из cron')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default='default', help='Псевдоним базы данных')
+
+    def handle(self, *args, **options):
+        connection = connections[options['database']]
+        models = list(apps.get_app_config('shop').get_models())
+        with connection.cursor() as cursor:
+            for model in models:
+                table = connection.ops.quote_name(model._meta.db_table)
+                if connection.vendor == 'mysql':
+                    cursor.execute(f'ANALYZE TABLE {table}')
+                    cursor.fetchall()
+                else:
+                    cursor.execute(f'ANALYZE {table}')
+
+        for model in models:
+            estimate = estimate_row_count(model, options['database'])
+            self.stdout.write(f'{model._meta.db_table}: ~{estimate if estimate is not None else "?"} строк')
+        self.stdout.write(self.style.SUCCESS(f'Статистика обновлена для таблиц: {len(models)}'))
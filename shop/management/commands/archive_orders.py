@@ -0,0 +1,38 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from shop.archive import archive_orders, archive_after_days
+
+
+class Command(BaseCommand):
+    help = 'Перенос завершенных и отмененных заказов старше заданного срока в архивные таблицы'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days', type=int, default=None,
+            help=f'Возраст заказа в днях (по умолчанию SHOP_ARCHIVE_AFTER_DAYS = {archive_after_days()})',
+        )
+        parser.add_argument('--batch-size', type=int, default=500, help='Заказов в одной транзакции')
+        parser.add_argument(
+            '--max-batches', type=int, default=None,
+            help='Остановиться после указанного числа пакетов (повторный запуск продолжит)',
+        )
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        total_orders = total_items = 0
+        for orders, items in archive_orders(
+            days=options['days'],
+            batch_size=options['batch_size'],
+            max_batches=options['max_batches'],
+        ):
+            total_orders += orders
+            total_items += items
+            if options['verbosity'] > 1:
+                self.stdout.write(f'Пакет: заказов {orders}, позиций {items}')
+
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Перенесено в архив заказов: {total_orders}, позиций: {total_items} за {elapsed:.2f} с'
+        ))
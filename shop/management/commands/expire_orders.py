@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand
+
+from shop.order_status import expire_overdue_orders, expire_after_days
+
+
+class Command(BaseCommand):
+    help = ('Отмена заказов «В обработке», не полученных в срок после даты доставки '
+            '(для запуска по расписанию)')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days', type=int, default=None,
+            help=f'Сколько дней после даты доставки ждать получения (по умолчанию {expire_after_days()})',
+        )
+        parser.add_argument('--chunk-size', type=int, default=1000, help='Заказов в одной транзакции')
+        parser.add_argument(
+            '--pause', type=float, default=0.0,
+            help='Пауза между порциями в секундах, чтобы освободить БД для других запросов',
+        )
+        parser.add_argument('--dry-run', action='store_true', help='Только показать, сколько заказов будет отменено')
+
+    def handle(self, *args, **options):
+        metrics = expire_overdue_orders(
+            days=options['days'],
+            chunk_size=options['chunk_size'],
+            pause=options['pause'],
+            dry_run=options['dry_run'],
+        )
+        rate = metrics['orders'] / metrics['elapsed'] if metrics['elapsed'] else 0
+
+        if options['dry_run']:
+            self.stdout.write(f"Будет отменено заказов: {metrics['orders']}")
+        else:
+            self.stdout.write(self.style.SUCCESS(
+                f"Отменено заказов: {metrics['orders']} за {metrics['elapsed']:.2f} с "
+                f"({rate:.0f} заказов/с, порций: {metrics['chunks']})"
+            ))
+        self.stdout.write(f"Просрочено, но еще ожидают получения: {metrics['overdue']}")
@@ -0,0 +1,96 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from openpyxl import load_workbook
+
+from shop.cache import bump_version
+from shop.geo import DELIVERY_POINTS_VERSION, GeocodeTable, parse_postcode
+from shop.models import DeliveryPoint
+
+
+class Command(BaseCommand):
+    help = 'Импорт пунктов выдачи из Excel с геокодированием по офлайн-таблице индексов'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--file', default=str(settings.BASE_DIR / 'import' / 'Пункты выдачи_import.xlsx'),
+            help='Файл Excel с адресами пунктов выдачи (по одному адресу в строке)',
+        )
+        parser.add_argument(
+            '--geocode-table', default=getattr(settings, 'SHOP_GEOCODE_TABLE', None),
+            help='CSV-файл с колонками postcode, latitude, longitude',
+        )
+        parser.add_argument(
+            '--geocode-only', action='store_true',
+            help='Не читать Excel, только заново геокодировать существующие пункты',
+        )
+
+    def handle(self, *args, **options):
+        table = self._load_table(options['geocode_table'], required=options['geocode_only'])
+
+        with transaction.atomic():
+            if not options['geocode_only']:
+                created = self._import_addresses(options['file'])
+                self.stdout.write(f'Добавлено пунктов выдачи: {created}')
+            if table is None:
+                # Без таблицы только импортируем адреса, известные координаты не трогаем
+                if created:
+                    bump_version(DELIVERY_POINTS_VERSION)
+                return
+
+            points = list(DeliveryPoint.objects.all())
+            geocoded = sum(point.geocode(table) for point in points)
+            DeliveryPoint.objects.bulk_update(
+                points, ['postcode', 'latitude', 'longitude'], batch_size=500
+            )
+
+        # bulk-операции не отправляют сигналы, поэтому индекс сбрасываем явно
+        bump_version(DELIVERY_POINTS_VERSION)
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Геокодировано {geocoded} из {len(points)} пунктов выдачи'
+        ))
+        if geocoded < len(points):
+            self.stdout.write(self.style.WARNING(
+                'Для остальных пунктов индекс не найден в таблице геокодирования'
+            ))
+
+    def _load_table(self, path, required):
+        if not path:
+            message = 'Не задана таблица геокодирования (SHOP_GEOCODE_TABLE или --geocode-table)'
+        else:
+            try:
+                table = GeocodeTable.from_csv(path)
+            except FileNotFoundError:
+                message = f'Файл таблицы геокодирования не найден: {path}'
+            else:
+                message = None
+        if message:
+            if required:
+                raise CommandError(message)
+            self.stdout.write(self.style.WARNING(
+                f'{message}. Адреса будут импортированы без координат'
+            ))
+            return None
+        self.stdout.write(f'Загружено индексов в таблице геокодирования: {len(table)}')
+        return table
+
+    def _import_addresses(self, path):
+        try:
+            workbook = load_workbook(path, read_only=True)
+        except FileNotFoundError:
+            raise CommandError(f'Файл не найден: {path}')
+
+        addresses = []
+        for row in workbook.active.iter_rows(values_only=True):
+            if row and row[0]:
+                addresses.append(str(row[0]).strip())
+        workbook.close()
+
+        existing = set(DeliveryPoint.objects.values_list('address', flat=True))
+        new_points = [
+            DeliveryPoint(address=address, postcode=parse_postcode(address))
+            for address in dict.fromkeys(addresses) if address not in existing
+        ]
+        DeliveryPoint.objects.bulk_create(new_points, batch_size=500)
+        return len(new_points)
@@ -0,0 +1,128 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import nullcontext
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from shop.cache import CATALOGUE_VERSION, bump_version
+from shop.models import Product
+from shop.photos import (
+    MANIFEST_NAME, PRIMARY_RENDITION, Manifest, find_sources, process_photo,
+    rendition_path, renditions_settings, renditions_signature,
+)
+
+
+class Command(BaseCommand):
+    help = 'Обработка оригиналов фотографий товаров в пуле процессов (варианты из SHOP_PHOTO_RENDITIONS)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--source', default=str(settings.BASE_DIR / 'import'),
+            help='Каталог с оригиналами фотографий',
+        )
+        parser.add_argument(
+            '--workers', type=int, default=os.cpu_count(),
+            help='Число процессов обработки (по умолчанию - число ядер)',
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=500,
+            help='Размер пакета при обновлении Product.photo',
+        )
+        parser.add_argument(
+            '--force', action='store_true',
+            help='Обработать все фотографии заново, не сверяя хеши',
+        )
+
+    def handle(self, *args, **options):
+        source = Path(options['source'])
+        if not source.is_dir():
+            raise CommandError(f'Каталог не найден: {source}')
+        renditions = renditions_settings()
+        if PRIMARY_RENDITION not in renditions:
+            raise CommandError(f'В SHOP_PHOTO_RENDITIONS нет варианта {PRIMARY_RENDITION!r}')
+
+        manifest = Manifest(Path(settings.MEDIA_ROOT) / MANIFEST_NAME, renditions_signature(renditions))
+
+        tasks, products, unmatched = self._match(find_sources(source), renditions, manifest, options['force'])
+        for path in unmatched:
+            self.stdout.write(f'Не найден товар для файла: {path.name}', self.style.WARNING)
+
+        # Дочерние процессы не должны наследовать открытые соединения с БД
+        connections.close_all()
+        started = time.monotonic()
+        counts = {'processed': 0, 'skipped': 0, 'failed': 0}
+        pending = []
+        updated = 0
+        workers = max(options['workers'] or 1, 1)
+        # Один процесс - обработка на месте, без пула (и внутри процессов-демонов)
+        with ProcessPoolExecutor(max_workers=workers) if workers > 1 else nullcontext() as executor:
+            if executor is None:
+                results = map(process_photo, tasks)
+            else:
+                results = executor.map(process_photo, tasks, chunksize=max(len(tasks) // (workers * 4), 1))
+            for path, digest, status, error in results:
+                counts[status] += 1
+                name = Path(path).name
+                manifest.set(name, digest)
+                if status == 'failed':
+                    self.stdout.write(f'Ошибка обработки {name}: {error}', self.style.ERROR)
+                    continue
+                product, photo = products[path]
+                if product.photo.name != photo:
+                    product.photo.name = photo
+                    pending.append(product)
+                if len(pending) >= options['batch_size']:
+                    updated += self._flush(pending, options['batch_size'])
+        updated += self._flush(pending, options['batch_size'])
+        elapsed = time.monotonic() - started
+        manifest.save()
+
+        if updated:
+            # bulk_update не отправляет сигналы, поэтому кеш каталога сбрасываем явно
+            bump_version(CATALOGUE_VERSION)
+
+        rate = counts['processed'] / elapsed if elapsed else 0
+        self.stdout.write(self.style.SUCCESS(
+            f"Обработано: {counts['processed']}, без изменений: {counts['skipped']}, "
+            f"ошибок: {counts['failed']}, без товара: {len(unmatched)}; "
+            f'обновлено товаров: {updated}'
+        ))
+        self.stdout.write(
+            f'{elapsed:.2f} с, {rate:.1f} изображений/с, процессов: {workers}'
+        )
+
+    def _match(self, sources, renditions, manifest, force):
+        """Сопоставить оригиналы с товарами: по имени текущего фото или по артикулу"""
+        by_photo = {}
+        by_article = {}
+        for product in Product.objects.only('article', 'photo'):
+            by_article[product.article.strip().upper()] = product
+            if product.photo:
+                by_photo[Path(product.photo.name).stem] = product
+
+        tasks = []
+        products = {}
+        unmatched = []
+        for path in sources:
+            product = by_photo.get(path.stem) or by_article.get(path.stem.strip().upper())
+            if product is None:
+                unmatched.append(path)
+                continue
+            outputs = {
+                str(Path(settings.MEDIA_ROOT) / rendition_path(config, path.stem)): config
+                for config in renditions.values()
+            }
+            products[str(path)] = (product, rendition_path(renditions[PRIMARY_RENDITION], path.stem))
+            tasks.append((str(path), None if force else manifest.get(path.name), outputs))
+        return tasks, products, unmatched
+
+    def _flush(self, pending, batch_size):
+        count = len(pending)
+        if pending:
+            Product.objects.bulk_update(pending, ['photo'], batch_size=batch_size)
+            pending.clear()
+        return count
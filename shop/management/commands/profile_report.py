@@ -0,0 +1,92 @@
+import io
+import json
+import pstats
+import re
+from collections import defaultdict
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from shop.profiling import profiling_settings
+
+
+NUMBER_RE = re.compile(r'\b\d+(\.\d+)?\b')
+STRING_RE = re.compile(r"'(?:[^']|'')*'")
+IN_LIST_RE = re.compile(r'\bIN \([^)]*\)', re.IGNORECASE)
+
+
+def normalize_sql(sql):
+    """Привести SQL к шаблону: значения и списки IN заменяются на ?"""
+    sql = STRING_RE.sub('?', sql)
+    sql = NUMBER_RE.sub('?', sql)
+    sql = IN_LIST_RE.sub('IN (...)', sql)
+    return ' '.join(sql.split())
+
+
+class Command(BaseCommand):
+    help = 'Сводный отчет по сохраненным профилям: самые затратные функции и SQL-запросы по каждому URL'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dir', help='Каталог профилей (по умолчанию SHOP_PROFILING["DIR"])')
+        parser.add_argument('--top', type=int, default=15, help='Сколько функций и запросов показать')
+        parser.add_argument(
+            '--sort', default='cumulative', choices=['cumulative', 'tottime', 'ncalls'],
+            help='Сортировка функций',
+        )
+        parser.add_argument('url_names', nargs='*', help='Имена URL (по умолчанию все)')
+
+    def handle(self, *args, **options):
+        root = Path(options['dir'] or profiling_settings()['DIR'])
+        if not root.is_dir():
+            raise CommandError(f'Каталог профилей не найден: {root}')
+
+        directories = sorted(path for path in root.iterdir() if path.is_dir())
+        if options['url_names']:
+            directories = [path for path in directories if path.name in options['url_names']]
+        if not directories:
+            self.stdout.write('Профилей нет')
+            return
+
+        for directory in directories:
+            self.report(directory, options['top'], options['sort'])
+
+    def report(self, directory, top, sort):
+        profiles = sorted(directory.glob('*.prof'))
+        if not profiles:
+            return
+
+        requests = 0
+        elapsed = 0.0
+        queries = defaultdict(lambda: {'count': 0, 'time': 0.0})
+        total_queries = 0
+        for path in directory.glob('*.sql.json'):
+            with open(path, encoding='utf-8') as f:
+                data = json.load(f)
+            requests += 1
+            elapsed += data['elapsed']
+            total_queries += len(data['queries'])
+            for query in data['queries']:
+                stats = queries[normalize_sql(query['sql'])]
+                stats['count'] += 1
+                stats['time'] += query['time']
+
+        self.stdout.write(self.style.MIGRATE_HEADING(f'== {directory.name} =='))
+        if requests:
+            self.stdout.write(
+                f'Запросов: {requests}, среднее время: {elapsed / requests * 1000:.1f} мс, '
+                f'SQL на запрос: {total_queries / requests:.1f}'
+            )
+
+        output = io.StringIO()
+        stats = pstats.Stats(*[str(path) for path in profiles], stream=output)
+        stats.strip_dirs().sort_stats(sort).print_stats(top)
+        self.stdout.write(self.style.MIGRATE_LABEL('Функции:'))
+        self.stdout.write(output.getvalue().strip())
+
+        self.stdout.write(self.style.MIGRATE_LABEL('SQL (по суммарному времени):'))
+        ranked = sorted(queries.items(), key=lambda item: item[1]['time'], reverse=True)[:top]
+        for sql, query_stats in ranked:
+            self.stdout.write(
+                f"  {query_stats['time'] * 1000:9.1f} мс  {query_stats['count']:6d} раз  {sql[:200]}"
+            )
+        self.stdout.write('')
@@ -0,0 +1,20 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from shop.profiling import make_profile_token
+
+
+class Command(BaseCommand):
+    help = 'Выдать сотруднику значение заголовка X-Shop-Profile для профилирования его запросов'
+
+    def add_arguments(self, parser):
+        parser.add_argument('username')
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(username=options['username'])
+        except User.DoesNotExist:
+            raise CommandError(f'Пользователь не найден: {options["username"]}')
+        if not user.is_staff:
+            raise CommandError('Профилирование по заголовку доступно только сотрудникам (is_staff)')
+        self.stdout.write(make_profile_token(user))
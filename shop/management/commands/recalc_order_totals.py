@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from shop.models import Order
+from shop.totals import fill_missing_snapshots, update_order_totals
+
+
+class Command(BaseCommand):
+    help = ('Снять недостающие снимки цен позиций и пересчитать итоги заказов. Нужна после '
+            'групповых операций без сигналов (bulk_create, QuerySet.update, загрузка данных)')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help='Заказов в одном пересчете')
+
+    def handle(self, *args, **options):
+        snapshots = fill_missing_snapshots()
+        self.stdout.write(f'Снято снимков цен: {snapshots}')
+
+        batch_size = options['batch_size']
+        order_ids = list(Order.objects.order_by('id').values_list('id', flat=True))
+        for start in range(0, len(order_ids), batch_size):
+            update_order_totals(order_ids[start:start + batch_size])
+        self.stdout.write(self.style.SUCCESS(f'Пересчитаны итоги заказов: {len(order_ids)}'))
@@ -0,0 +1,49 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+
+from shop.replenishment import compute_replenishment, CACHE_KEY
+
+
+class Command(BaseCommand):
+    help = 'Отчет о пополнении склада: скорость продаж, дни до исчерпания и объем дозаказа по поставщикам'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lead-time', type=int, help='Срок поставки, дней')
+        parser.add_argument('--cover', type=int, help='На сколько дней продаж заказывать, дней')
+        parser.add_argument('--window', type=int, help='Окно для расчета скорости продаж, дней')
+        parser.add_argument(
+            '--warm-cache', action='store_true',
+            help='Сохранить отчет в кеш для страницы менеджера',
+        )
+
+    def handle(self, *args, **options):
+        report = compute_replenishment(
+            velocity_window=options['window'],
+            lead_time_days=options['lead_time'],
+            cover_days=options['cover'],
+        )
+        if options['warm_cache']:
+            cache.set(CACHE_KEY, report, getattr(settings, 'SHOP_REPLENISHMENT_CACHE_SECONDS', 600))
+
+        windows = ' / '.join(f'{w} дн.' for w in report['windows'])
+        self.stdout.write(
+            f"Товаров: {report['products_count']}, срок поставки: {report['lead_time_days']} дн., "
+            f"запас на: {report['cover_days']} дн., окна: {windows}"
+        )
+        if not report['suppliers']:
+            self.stdout.write(self.style.SUCCESS('Пополнение не требуется'))
+            return
+
+        for supplier in report['suppliers']:
+            self.stdout.write('')
+            self.stdout.write(self.style.MIGRATE_HEADING(
+                f"{supplier['name']} - к заказу {supplier['total_reorder_quantity']} ед."
+            ))
+            for row in supplier['products']:
+                velocities = ' / '.join(str(v) for v in row['velocities'])
+                self.stdout.write(
+                    f"  {row['article']:<12} {row['name'][:30]:<30} остаток {row['quantity']:>6}  "
+                    f"продажи/день {velocities:<20} хватит на {row['days_until_stockout']:>6} дн.  "
+                    f"заказать {row['reorder_quantity']:>6}"
+                )
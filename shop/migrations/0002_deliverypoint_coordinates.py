@@ -0,0 +1,40 @@
+# Generated by Django 6.0.2 on 2026-10-18 12:00
+
+import re
+
+from django.db import migrations, models
+
+
+def fill_postcodes(apps, schema_editor):
+    DeliveryPoint = apps.get_model('shop', 'DeliveryPoint')
+    points = list(DeliveryPoint.objects.all())
+    for point in points:
+        match = re.search(r'\b(\d{6})\b', point.address)
+        point.postcode = match.group(1) if match else ''
+    DeliveryPoint.objects.bulk_update(points, ['postcode'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='deliverypoint',
+            name='latitude',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='deliverypoint',
+            name='longitude',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='deliverypoint',
+            name='postcode',
+            field=models.CharField(blank=True, db_index=True, max_length=6),
+        ),
+        migrations.RunPython(fill_postcodes, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 6.0.2 on 2026-10-18 12:00
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0002_deliverypoint_coordinates'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductCoOccurrence',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='co_occurrences', to='shop.product')),
+                ('related', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='shop.product')),
+            ],
+            options={
+                'verbose_name_plural': 'Совместные покупки',
+                'indexes': [models.Index(fields=['product', '-count'], name='shop_cooc_product_count_idx')],
+                'unique_together': {('product', 'related')},
+            },
+        ),
+    ]
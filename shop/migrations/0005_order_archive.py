@@ -0,0 +1,43 @@
+# Generated by Django 6.0.2 on 2026-10-18 12:00
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0004_order_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedOrder',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('order_number', models.IntegerField(unique=True)),
+                ('order_date', models.DateTimeField(db_index=True)),
+                ('delivery_date', models.DateTimeField()),
+                ('customer_name', models.CharField(max_length=200)),
+                ('code', models.IntegerField()),
+                ('status', models.CharField(choices=[('pending', 'В обработке'), ('completed', 'Завершен'), ('cancelled', 'Отменен')], max_length=20)),
+                ('archived_at', models.DateTimeField(auto_now_add=True)),
+                ('delivery_point', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='shop.deliverypoint')),
+            ],
+            options={
+                'verbose_name_plural': 'Архив заказов',
+            },
+        ),
+        migrations.CreateModel(
+            name='ArchivedOrderItem',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('quantity', models.IntegerField(default=1)),
+                ('order', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='items', to='shop.archivedorder')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='+', to='shop.product')),
+            ],
+            options={
+                'verbose_name_plural': 'Товары в архивных заказах',
+            },
+        ),
+    ]
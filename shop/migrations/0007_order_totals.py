@@ -0,0 +1,142 @@
+# Generated by Django 6.0.2 on 2026-10-18 12:00
+
+from decimal import Decimal
+
+from django.db import migrations, models
+from django.db.models import Count, F, Sum
+
+
+def backfill_item(item):
+    item.unit_price = item.product.price
+    item.discount = item.product.discount
+    price = item.unit_price
+    if item.discount > 0:
+        price = round(price - price * (item.discount / 100), 2)
+    item.line_total = price * item.quantity
+
+
+def backfill_totals(apps, schema_editor):
+    # Цен на момент оформления не сохранилось - берем текущие цены товаров
+    for order_model, item_model in (('Order', 'OrderItem'), ('ArchivedOrder', 'ArchivedOrderItem')):
+        Order = apps.get_model('shop', order_model)
+        OrderItem = apps.get_model('shop', item_model)
+
+        items = list(OrderItem.objects.select_related('product'))
+        for item in items:
+            backfill_item(item)
+        OrderItem.objects.bulk_update(items, ['unit_price', 'discount', 'line_total'], batch_size=500)
+
+        totals = (
+            OrderItem.objects.order_by().values('order_id')
+            .annotate(
+                items=Count('id'), units=Sum('quantity'),
+                gross=Sum(F('unit_price') * F('quantity')), net=Sum('line_total'),
+            )
+        )
+        orders = []
+        for row in totals:
+            gross = Decimal(row['gross']).quantize(Decimal('0.01'))
+            net = Decimal(row['net']).quantize(Decimal('0.01'))
+            orders.append(Order(
+                id=row['order_id'], total_items=row['items'], total_units=row['units'],
+                total_gross=gross, total_discount=gross - net, total_net=net,
+            ))
+        Order.objects.bulk_update(
+            orders, ['total_items', 'total_units', 'total_gross', 'total_discount', 'total_net'],
+            batch_size=500,
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0006_order_status_delivery_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='archivedorder',
+            name='total_discount',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=12),
+        ),
+        migrations.AddField(
+            model_name='archivedorder',
+            name='total_gross',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=12),
+        ),
+        migrations.AddField(
+            model_name='archivedorder',
+            name='total_items',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='archivedorder',
+            name='total_net',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=12),
+        ),
+        migrations.AddField(
+            model_name='archivedorder',
+            name='total_units',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='archivedorderitem',
+            name='discount',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=5),
+        ),
+        migrations.AddField(
+            model_name='archivedorderitem',
+            name='line_total',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=12),
+        ),
+        migrations.AddField(
+            model_name='archivedorderitem',
+            name='unit_price',
+            field=models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True),
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='total_discount',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=12),
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='total_gross',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=12),
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='total_items',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='total_net',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=12),
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='total_units',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='orderitem',
+            name='discount',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=5),
+        ),
+        migrations.AddField(
+            model_name='orderitem',
+            name='line_total',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=12),
+        ),
+        migrations.AddField(
+            model_name='orderitem',
+            name='unit_price',
+            field=models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['total_net'], name='shop_order_total_net_idx'),
+        ),
+        migrations.RunPython(backfill_totals, migrations.RunPython.noop),
+    ]
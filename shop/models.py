@@ -87,10 +87,22 @@ class UserProfile(models.Model):
 class DeliveryPoint(models.Model):
     """Пункт выдачи товара"""
     address = models.CharField(max_length=500)
+    postcode = models.CharField(max_length=6, blank=True, db_index=True)
+    latitude = models.FloatField(null=True, blank=True)
+    longitude = models.FloatField(null=True, blank=True)
     
     def __str__(self):
         return self.address
     
+    def geocode(self, table):
+        """Заполнить индекс и координаты по таблице геокодирования"""
+        from .geo import parse_postcode
+        
+        self.postcode = parse_postcode(self.address)
+        coords = table.lookup(self.postcode)
+        self.latitude, self.longitude = coords if coords else (None, None)
+        return coords is not None
+    
     class Meta:
         verbose_name_plural = "Пункты выдачи"
 
@@ -111,12 +123,26 @@ class Order(models.Model):
     customer_name = models.CharField(max_length=200)
     code = models.IntegerField()
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    # Итоги по позициям (пересчитываются при их изменении, см. shop.totals)
+    total_items = models.IntegerField(default=0)
+    total_units = models.IntegerField(default=0)
+    total_gross = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    total_discount = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    total_net = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    
+    is_archived = False
     
     def __str__(self):
         return f"Заказ #{self.order_number}"
     
     class Meta:
         verbose_name_plural = "Заказы"
+        indexes = [
+            models.Index(fields=['order_date'], name='shop_order_date_idx'),
+            models.Index(fields=['status', 'order_date'], name='shop_order_status_date_idx'),
+            models.Index(fields=['status', 'delivery_date'], name='shop_order_status_deliv_idx'),
+            models.Index(fields=['total_net'], name='shop_order_total_net_idx'),
+        ]
 
 
 class OrderItem(models.Model):
@@ -124,10 +150,97 @@ class OrderItem(models.Model):
     order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name='items')
     product = models.ForeignKey(Product, on_delete=models.PROTECT)
     quantity = models.IntegerField(default=1, validators=[MinValueValidator(1)])
+    # Цена и скидка товара на момент добавления в заказ
+    unit_price = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
+    discount = models.DecimalField(max_digits=5, decimal_places=2, default=0)
+    line_total = models.DecimalField(max_digits=12, decimal_places=2, default=0)
     
     def __str__(self):
         return f"{self.order} - {self.product.name}"
     
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Товар, для которого взята цена: при замене товара снимок обновляется
+        if 'product_id' in instance.__dict__:
+            instance._snapshot_product_id = instance.product_id
+        return instance
+    
+    def take_snapshot(self):
+        """Запомнить цену товара (для новой позиции или при замене товара) и сумму строки"""
+        if self.unit_price is None or self.product_id != getattr(self, '_snapshot_product_id', self.product_id):
+            self.unit_price = self.product.price
+            self.discount = self.product.discount
+            self._snapshot_product_id = self.product_id
+        price = self.unit_price
+        if self.discount > 0:
+            price = round(price - price * (self.discount / 100), 2)
+        self.line_total = price * self.quantity
+    
+    def save(self, *args, **kwargs):
+        self.take_snapshot()
+        super().save(*args, **kwargs)
+    
     class Meta:
         verbose_name_plural = "Товары в заказах"
         unique_together = ('order', 'product')
+
+
+class ProductCoOccurrence(models.Model):
+    """Совместные покупки: сколько заказов содержат оба товара"""
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='co_occurrences')
+    related = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='+')
+    count = models.PositiveIntegerField(default=0)
+    
+    def __str__(self):
+        return f"{self.product_id} + {self.related_id}: {self.count}"
+    
+    class Meta:
+        verbose_name_plural = "Совместные покупки"
+        unique_together = ('product', 'related')
+        indexes = [
+            models.Index(fields=['product', '-count'], name='shop_cooc_product_count_idx'),
+        ]
+
+
+class ArchivedOrder(models.Model):
+    """Архивный заказ: завершенные и отмененные заказы старше срока хранения"""
+    id = models.BigIntegerField(primary_key=True)
+    order_number = models.IntegerField(unique=True)
+    order_date = models.DateTimeField(db_index=True)
+    delivery_date = models.DateTimeField()
+    delivery_point = models.ForeignKey(DeliveryPoint, on_delete=models.SET_NULL, null=True, related_name='+')
+    customer_name = models.CharField(max_length=200)
+    code = models.IntegerField()
+    status = models.CharField(max_length=20, choices=Order.STATUS_CHOICES)
+    total_items = models.IntegerField(default=0)
+    total_units = models.IntegerField(default=0)
+    total_gross = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    total_discount = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    total_net = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    archived_at = models.DateTimeField(auto_now_add=True)
+    
+    is_archived = True
+    
+    def __str__(self):
+        return f"Заказ #{self.order_number} (архив)"
+    
+    class Meta:
+        verbose_name_plural = "Архив заказов"
+
+
+class ArchivedOrderItem(models.Model):
+    """Товар в архивном заказе"""
+    id = models.BigIntegerField(primary_key=True)
+    order = models.ForeignKey(ArchivedOrder, on_delete=models.CASCADE, related_name='items')
+    product = models.ForeignKey(Product, on_delete=models.PROTECT, related_name='+')
+    quantity = models.IntegerField(default=1)
+    unit_price = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
+    discount = models.DecimalField(max_digits=5, decimal_places=2, default=0)
+    line_total = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    
+    def __str__(self):
+        return f"{self.order} - {self.product_id}"
+    
+    class Meta:
+        verbose_name_plural = "Товары в архивных заказах"
@@ -0,0 +1,78 @@
+"""Плановые переходы статусов заказов
+
+Заказы в статусе «В обработке», не полученные в течение
+SHOP_ORDER_EXPIRE_AFTER_DAYS после даты доставки, отменяются. Остатки
+на складе не меняются: при оформлении заказа товар не резервируется,
+поэтому возвращать нечего. Заказы ищутся по индексу (status, delivery_date)
+и обрабатываются порциями: каждая порция - короткая транзакция из
+группового UPDATE, поэтому блокировка записи в SQLite не держится
+долго и другие запросы успевают выполняться между порциями.
+"""
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Order
+
+
+def expire_after_days():
+    return getattr(settings, 'SHOP_ORDER_EXPIRE_AFTER_DAYS', 14)
+
+
+def expired_orders(expire_before):
+    return Order.objects.filter(status='pending', delivery_date__lt=expire_before)
+
+
+def expire_chunk(expire_before, chunk_size):
+    """Отменить одну порцию просроченных заказов, вернуть метрики порции"""
+    candidates = list(
+        expired_orders(expire_before)
+        .order_by('delivery_date', 'id')
+        .values_list('id', flat=True)[:chunk_size]
+    )
+    if not candidates:
+        return {'candidates': 0, 'orders': 0}
+
+    with transaction.atomic():
+        # Повторная проверка статуса внутри транзакции: заказ мог измениться
+        ids = list(
+            Order.objects.select_for_update()
+            .filter(id__in=candidates, status='pending')
+            .values_list('id', flat=True)
+        )
+        Order.objects.filter(id__in=ids).update(status='cancelled')
+    return {'candidates': len(candidates), 'orders': len(ids)}
+
+
+def expire_overdue_orders(now=None, days=None, chunk_size=1000, pause=0.0, dry_run=False):
+    """Отменить все просроченные заказы порциями и вернуть метрики запуска"""
+    now = now or timezone.now()
+    if days is None:
+        days = expire_after_days()
+    expire_before = now - timedelta(days=days)
+    started = time.monotonic()
+    metrics = {'chunks': 0, 'orders': 0}
+
+    if dry_run:
+        metrics['orders'] = expired_orders(expire_before).count()
+
+    while not dry_run:
+        chunk = expire_chunk(expire_before, chunk_size)
+        # Порция может оказаться пустой после повторной проверки,
+        # останавливаемся только когда кандидатов больше нет
+        if not chunk['candidates']:
+            break
+        metrics['chunks'] += 1
+        metrics['orders'] += chunk['orders']
+        if pause:
+            time.sleep(pause)
+
+    # Просроченные, но еще не истекшие заказы - только для отчета
+    metrics['overdue'] = Order.objects.filter(
+        status='pending', delivery_date__lt=now, delivery_date__gte=expire_before
+    ).count()
+    metrics['elapsed'] = time.monotonic() - started
+    return metrics
@@ -0,0 +1,219 @@
+"""Кеш целых страниц для анонимных посетителей
+
+Готовый ответ хранится в кеше вместе с ETag и версиями данных, из которых
+он построен. Пока ответ свежий, он отдается как есть (или 304 на условный
+GET). Устаревший ответ (истек max_age или изменились данные) в течение
+окна stale еще отдается, а новая версия строится в фоне; построением
+занимается только один запрос (single flight), остальные получают старую
+страницу, поэтому всплеск трафика вызывает одну перестройку.
+
+Право на перестройку между процессами дает атомарная метка: в файловом
+кеше это файл, созданный с O_CREAT | O_EXCL в каталоге кеша (add файлового
+кеша не атомарен), в остальных кешах - cache.add (атомарен в Redis).
+
+Ключ страницы зависит только от объявленных GET-параметров (vary_on),
+остальные параметры отбрасываются и при построении страницы, поэтому
+произвольная строка запроса не размножает записи в кеше.
+"""
+import hashlib
+import os
+import threading
+import time
+from functools import wraps
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.contrib.messages import get_messages
+from django.core.cache import cache, caches
+from django.core.cache.backends.filebased import FileBasedCache
+from django.db import close_old_connections
+from django.http import HttpRequest, HttpResponse, HttpResponseNotModified, QueryDict
+from django.utils.cache import patch_vary_headers
+
+from .cache import get_version
+
+
+KEY_PREFIX = 'shop:page:'
+
+# Процессная часть single flight: ключи, которые сейчас перестраиваются
+_building = set()
+_building_lock = threading.Lock()
+
+
+def _query_string(request, vary_on):
+    """Строка запроса только из объявленных параметров в постоянном порядке"""
+    query = QueryDict(mutable=True)
+    for param in sorted(set(vary_on)):
+        if param in request.GET:
+            query.setlist(param, request.GET.getlist(param))
+    return query.urlencode()
+
+
+def _cache_key(name, query):
+    return f'{KEY_PREFIX}{name}:{hashlib.md5(query.encode()).hexdigest()}'
+
+
+def _detached_request(request, query):
+    """Копия запроса для фоновой перестройки, не связанная с сессией посетителя"""
+    detached = HttpRequest()
+    detached.method = 'GET'
+    detached.path = request.path
+    detached.path_info = request.path_info
+    detached.GET = QueryDict(query)
+    detached.META = {
+        key: value for key, value in request.META.items()
+        if key in ('SERVER_NAME', 'SERVER_PORT', 'HTTP_HOST', 'SCRIPT_NAME', 'wsgi.url_scheme')
+    }
+    detached.META['QUERY_STRING'] = query
+    detached.user = AnonymousUser()
+    return detached
+
+
+def _lock_path(key):
+    directory = Path(settings.CACHES['default']['LOCATION'])
+    return directory / f'{hashlib.md5(key.encode()).hexdigest()}.lock'
+
+
+def _add_file_lock(key, timeout):
+    """Создать файл-метку атомарно; метка старше timeout считается брошенной"""
+    path = _lock_path(key)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    for _ in range(2):
+        try:
+            os.close(os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+            return True
+        except FileExistsError:
+            pass
+        try:
+            if time.time() - path.stat().st_mtime < timeout:
+                return False
+            # Процесс, строивший страницу, завершился, не сняв метку
+            path.unlink()
+        except FileNotFoundError:
+            pass
+    return False
+
+
+def _file_based():
+    return isinstance(caches['default'], FileBasedCache)
+
+
+def _add_lock(key, timeout):
+    if _file_based():
+        return _add_file_lock(key, timeout)
+    return cache.add(key + ':lock', 1, timeout)
+
+
+def _delete_lock(key):
+    if _file_based():
+        _lock_path(key).unlink(missing_ok=True)
+    else:
+        cache.delete(key + ':lock')
+
+
+def _acquire(key, timeout):
+    """Захватить право на перестройку страницы (в процессе и между процессами)"""
+    with _building_lock:
+        if key in _building:
+            return False
+        if not _add_lock(key, timeout):
+            return False
+        _building.add(key)
+        return True
+
+
+def _release(key):
+    _delete_lock(key)
+    with _building_lock:
+        _building.discard(key)
+
+
+def _build(view, request, args, kwargs, key, versions, ttl):
+    response = view(request, *args, **kwargs)
+    if hasattr(response, 'render') and callable(response.render):
+        response = response.render()
+    if response.status_code != 200:
+        return None
+    entry = {
+        'content': response.content,
+        'content_type': response['Content-Type'],
+        'etag': '"%s"' % hashlib.md5(response.content).hexdigest(),
+        'versions': versions,
+        'created': time.time(),
+    }
+    cache.set(key, entry, ttl)
+    return entry
+
+
+def _build_in_background(view, request, args, kwargs, key, versions, ttl):
+    def run():
+        try:
+            _build(view, request, args, kwargs, key, versions, ttl)
+        finally:
+            _release(key)
+            close_old_connections()
+
+    threading.Thread(target=run, daemon=True).start()
+
+
+def _response(request, entry, max_age, stale):
+    if entry['etag'] in request.META.get('HTTP_IF_NONE_MATCH', ''):
+        response = HttpResponseNotModified()
+    else:
+        response = HttpResponse(entry['content'], content_type=entry['content_type'])
+    response['ETag'] = entry['etag']
+    response['Cache-Control'] = f'public, max-age={max_age}, stale-while-revalidate={stale}'
+    patch_vary_headers(response, ('Cookie',))
+    return response
+
+
+def stale_while_revalidate(name, versions=(), vary_on=(), max_age=60, stale=600, build_timeout=30):
+    """Кешировать страницу для анонимных посетителей
+
+    name - имя страницы в ключе кеша, versions - имена версий данных
+    (см. shop.cache), при изменении которых страница считается устаревшей,
+    vary_on - GET-параметры, от которых зависит содержимое страницы.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            # Авторизованным пользователям и страницам с сообщениями - без кеша
+            if (request.method not in ('GET', 'HEAD')
+                    or request.user.is_authenticated
+                    or len(get_messages(request))):
+                return view(request, *args, **kwargs)
+
+            query = _query_string(request, vary_on)
+            key = _cache_key(name, query)
+            current = {version: get_version(version) for version in versions}
+            ttl = max_age + stale
+            entry = cache.get(key)
+
+            if entry is not None:
+                age = time.time() - entry['created']
+                if age <= max_age and entry['versions'] == current:
+                    return _response(request, entry, max_age, stale)
+                if age <= ttl:
+                    # Отдаем устаревшую страницу, новая строится одним запросом в фоне
+                    if _acquire(key, build_timeout):
+                        _build_in_background(view, _detached_request(request, query), args, kwargs, key, current, ttl)
+                    return _response(request, entry, max_age, stale)
+
+            entry = None
+            # Страницы нет: строит один запрос, остальные недолго ждут его результата
+            if _acquire(key, build_timeout):
+                try:
+                    entry = _build(view, _detached_request(request, query), args, kwargs, key, current, ttl)
+                finally:
+                    _release(key)
+            else:
+                deadline = time.monotonic() + build_timeout
+                while entry is None and time.monotonic() < deadline:
+                    time.sleep(0.05)
+                    entry = cache.get(key)
+            if entry is None:
+                return view(request, *args, **kwargs)
+            return _response(request, entry, max_age, stale)
+        return wrapper
+    return decorator
@@ -0,0 +1,57 @@
+from django.conf import settings
+from django.core.paginator import Paginator
+from django.db import connections
+from django.utils.functional import cached_property
+
+
+def estimate_row_count(model, using='default'):
+    """Оценка числа строк таблицы по статистике СУБД (без COUNT(*))"""
+    connection = connections[using]
+    table = model._meta.db_table
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute('SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass', [table])
+        elif connection.vendor == 'sqlite':
+            # Статистика появляется после ANALYZE; первое число в stat - число строк
+            cursor.execute(
+                "SELECT name FROM sqlite_master WHERE type = 'table' AND name = 'sqlite_stat1'"
+            )
+            if cursor.fetchone() is None:
+                return None
+            cursor.execute('SELECT stat FROM sqlite_stat1 WHERE tbl = %s LIMIT 1', [table])
+        elif connection.vendor == 'mysql':
+            cursor.execute(
+                'SELECT table_rows FROM information_schema.tables '
+                'WHERE table_schema = DATABASE() AND table_name = %s', [table]
+            )
+        else:
+            return None
+        row = cursor.fetchone()
+    if row is None or row[0] is None:
+        return None
+    try:
+        estimate = int(str(row[0]).split()[0])
+    except ValueError:
+        return None
+    return estimate if estimate >= 0 else None
+
+
+class EstimatedCountPaginator(Paginator):
+    """Пагинатор, который для больших нефильтрованных таблиц берет оценку числа строк
+
+    Точный COUNT(*) выполняется только для отфильтрованных выборок и для
+    таблиц меньше порога SHOP_ESTIMATED_COUNT_THRESHOLD. В SQLite оценка
+    есть только после ANALYZE (команда analyze_tables), до этого всегда
+    выполняется точный подсчет.
+    """
+
+    @cached_property
+    def count(self):
+        query = getattr(self.object_list, 'query', None)
+        if query is None or query.where or query.distinct or query.combinator:
+            return super().count
+        threshold = getattr(settings, 'SHOP_ESTIMATED_COUNT_THRESHOLD', 10000)
+        estimate = estimate_row_count(self.object_list.model, self.object_list.db)
+        if estimate is None or estimate < threshold:
+            return super().count
+        return estimate
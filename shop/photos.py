@@ -0,0 +1,136 @@
+"""Пакетная обработка фотографий товаров
+
+Из оригинала строятся варианты (renditions) из настройки
+SHOP_PHOTO_RENDITIONS: каждый со своим размером, форматом и каталогом в
+MEDIA_ROOT. Вариант PRIMARY_RENDITION записывается в Product.photo.
+Обработка одного файла (чтение, уменьшение, кодирование всех вариантов)
+выполняется в отдельном процессе и не обращается к БД и настройкам Django,
+поэтому ее можно запускать в пуле процессов. Манифест хранит хеши
+содержимого обработанных оригиналов: неизмененные файлы пропускаются.
+"""
+import hashlib
+import io
+import json
+import os
+from pathlib import Path
+
+from django.conf import settings
+from PIL import Image, ImageOps
+
+
+PRIMARY_RENDITION = 'photo'
+
+# Манифест хешей оригиналов, путь относительно MEDIA_ROOT
+MANIFEST_NAME = 'products/manifest.json'
+
+IMAGE_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.gif', '.webp'}
+
+FORMAT_EXTENSIONS = {'JPEG': '.jpg', 'PNG': '.png', 'WEBP': '.webp', 'GIF': '.gif'}
+
+DEFAULT_RENDITIONS = {
+    PRIMARY_RENDITION: {'size': (300, 200), 'format': 'JPEG', 'quality': 85, 'dir': 'products'},
+}
+
+
+def renditions_settings():
+    return getattr(settings, 'SHOP_PHOTO_RENDITIONS', DEFAULT_RENDITIONS)
+
+
+def renditions_signature(renditions):
+    """Хеш настроек вариантов: при их изменении все фото обрабатываются заново"""
+    data = json.dumps(renditions, sort_keys=True, default=str)
+    return hashlib.md5(data.encode()).hexdigest()
+
+
+def rendition_path(config, stem):
+    """Путь варианта относительно MEDIA_ROOT"""
+    return f"{config['dir'].strip('/')}/{stem}{FORMAT_EXTENSIONS[config['format']]}"
+
+
+def find_sources(directory):
+    """Файлы изображений в каталоге оригиналов"""
+    return sorted(
+        path for path in Path(directory).iterdir()
+        if path.is_file() and path.suffix.lower() in IMAGE_EXTENSIONS
+    )
+
+
+def file_digest(path):
+    with open(path, 'rb') as f:
+        return hashlib.file_digest(f, 'sha256').hexdigest()
+
+
+def encode(image, config):
+    """Уменьшить изображение до размера варианта и закодировать в его формат"""
+    image = image.copy()
+    image.thumbnail(tuple(config['size']), Image.Resampling.LANCZOS)
+    if config['format'] == 'JPEG' and image.mode != 'RGB':
+        image = image.convert('RGB')
+    buffer = io.BytesIO()
+    options = {'optimize': True}
+    if 'quality' in config:
+        options['quality'] = config['quality']
+    image.save(buffer, format=config['format'], **options)
+    return buffer.getvalue()
+
+
+def _write(path, content):
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    temporary = path.with_name(f'.{path.name}.{os.getpid()}.tmp')
+    temporary.write_bytes(content)
+    os.replace(temporary, path)
+
+
+def process_photo(task):
+    """Обработать один оригинал (выполняется в процессе пула)
+
+    task - (путь оригинала, известный хеш или None, {путь варианта: настройки}).
+    Возвращает (путь оригинала, хеш, статус, ошибка), статус -
+    'processed', 'skipped' или 'failed'.
+    """
+    source, known_digest, outputs = task
+    try:
+        digest = file_digest(source)
+        if digest == known_digest and all(os.path.exists(path) for path in outputs):
+            return source, digest, 'skipped', None
+        with Image.open(source) as image:
+            # JPEG декодируется сразу в уменьшенном масштабе, если это возможно
+            largest = max(max(config['size']) for config in outputs.values())
+            image.draft('RGB', (largest, largest))
+            image = ImageOps.exif_transpose(image)
+            for path, config in outputs.items():
+                _write(path, encode(image, config))
+    except (OSError, ValueError, Image.DecompressionBombError) as e:
+        return source, None, 'failed', str(e)
+    return source, digest, 'processed', None
+
+
+class Manifest:
+    """Хеши обработанных оригиналов (JSON-файл рядом с фотографиями)"""
+
+    def __init__(self, path, signature):
+        self.path = Path(path)
+        self.signature = signature
+        self.files = {}
+        try:
+            data = json.loads(self.path.read_text(encoding='utf-8'))
+        except (FileNotFoundError, ValueError):
+            return
+        if data.get('renditions') == signature:
+            self.files = data.get('files', {})
+
+    def get(self, name):
+        return self.files.get(name)
+
+    def set(self, name, digest):
+        if digest is None:
+            self.files.pop(name, None)
+        else:
+            self.files[name] = digest
+
+    def save(self):
+        _write(self.path, json.dumps(
+            {'renditions': self.signature, 'files': self.files},
+            ensure_ascii=False, indent=2, sort_keys=True,
+        ).encode('utf-8'))
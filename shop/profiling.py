@@ -0,0 +1,166 @@
+"""Выборочное профилирование запросов
+
+ProfilingMiddleware включается настройкой SHOP_PROFILING['ENABLED'] и
+профилирует заданную долю запросов (SAMPLE_RATE) или запросы сотрудников,
+пришедшие с подписанным заголовком X-Shop-Profile (см. make_profile_token).
+Для каждого такого запроса сохраняются статистика cProfile и список
+SQL-запросов с временем выполнения в каталог <DIR>/<имя URL>/; в каждом
+каталоге хранится не больше MAX_FILES_PER_VIEW последних профилей.
+В процессе одновременно профилируется только один запрос (с Python 3.12
+cProfile не допускает двух активных профилировщиков), остальные
+выбранные запросы в это время обслуживаются без профилирования.
+Сводный отчет строит команда profile_report.
+"""
+import cProfile
+import json
+import logging
+import os
+import random
+import threading
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.core import signing
+from django.db import connections
+
+
+PROFILE_HEADER = 'HTTP_X_SHOP_PROFILE'
+SIGNING_SALT = 'shop.profiling'
+
+logger = logging.getLogger(__name__)
+
+# Один активный профилировщик на процесс
+_profiler_lock = threading.Lock()
+
+DEFAULTS = {
+    'ENABLED': False,
+    'SAMPLE_RATE': 0.01,
+    'DIR': None,
+    'MAX_FILES_PER_VIEW': 50,
+    'TOKEN_MAX_AGE': 3600,
+}
+
+
+def profiling_settings():
+    config = dict(DEFAULTS)
+    config.update(getattr(settings, 'SHOP_PROFILING', {}))
+    if not config['DIR']:
+        config['DIR'] = Path(settings.BASE_DIR) / 'profiles'
+    return config
+
+
+def make_profile_token(user):
+    """Подписанное значение заголовка X-Shop-Profile для сотрудника"""
+    return signing.TimestampSigner(salt=SIGNING_SALT).sign(str(user.pk))
+
+
+def _has_valid_token(request, max_age):
+    token = request.META.get(PROFILE_HEADER)
+    if not token:
+        return False
+    try:
+        user_pk = signing.TimestampSigner(salt=SIGNING_SALT).unsign(token, max_age=max_age)
+    except signing.BadSignature:
+        return False
+    user = getattr(request, 'user', None)
+    return bool(user and user.is_authenticated and user.is_staff and str(user.pk) == user_pk)
+
+
+class QueryRecorder:
+    """Обертка выполнения SQL: запоминает запросы и их длительность"""
+
+    def __init__(self):
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append({
+                'sql': sql,
+                'time': time.perf_counter() - started,
+                'alias': context['connection'].alias,
+            })
+
+
+def _rotate(directory, keep):
+    profiles = sorted(directory.glob('*.prof'))
+    for path in profiles[:max(len(profiles) - keep, 0)]:
+        path.unlink(missing_ok=True)
+        path.with_suffix('.sql.json').unlink(missing_ok=True)
+
+
+def _url_name(request):
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return 'unresolved'
+    return match.view_name.replace(':', '.') or 'unnamed'
+
+
+class ProfilingMiddleware:
+    """Профилирование выборки запросов с сохранением профилей на диск"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.config = profiling_settings()
+
+    def should_profile(self, request):
+        if not self.config['ENABLED']:
+            return False
+        if _has_valid_token(request, self.config['TOKEN_MAX_AGE']):
+            return True
+        return random.random() < self.config['SAMPLE_RATE']
+
+    def __call__(self, request):
+        if not self.should_profile(request):
+            return self.get_response(request)
+        if not _profiler_lock.acquire(blocking=False):
+            return self.get_response(request)
+        try:
+            return self.profile(request)
+        finally:
+            _profiler_lock.release()
+
+    def profile(self, request):
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:
+            # Профилировщик уже занят другим инструментом (отладчик, coverage)
+            return self.get_response(request)
+
+        recorder = QueryRecorder()
+        wrappers = [connection.execute_wrapper(recorder) for connection in connections.all()]
+        for wrapper in wrappers:
+            wrapper.__enter__()
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            profiler.disable()
+            elapsed = time.perf_counter() - started
+            for wrapper in reversed(wrappers):
+                wrapper.__exit__(None, None, None)
+
+        try:
+            self.dump(request, response, profiler, recorder, elapsed)
+        except OSError:
+            logger.exception('Не удалось сохранить профиль запроса %s', request.path)
+        return response
+
+    def dump(self, request, response, profiler, recorder, elapsed):
+        directory = Path(self.config['DIR']) / _url_name(request)
+        directory.mkdir(parents=True, exist_ok=True)
+        name = f'{time.time():.6f}-{os.getpid()}'
+        profiler.dump_stats(directory / f'{name}.prof')
+        with open(directory / f'{name}.sql.json', 'w', encoding='utf-8') as f:
+            json.dump({
+                'path': request.path,
+                'method': request.method,
+                'status': response.status_code,
+                'elapsed': elapsed,
+                'queries': recorder.queries,
+            }, f, ensure_ascii=False)
+        _rotate(directory, self.config['MAX_FILES_PER_VIEW'])
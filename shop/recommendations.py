@@ -0,0 +1,222 @@
+"""Рекомендации «Часто покупают вместе» на основе совместных покупок
+
+Матрица совместных покупок товар x товар хранится в разреженном виде
+в таблице ProductCoOccurrence. Полностью она пересчитывается командой
+build_recommendations, а при добавлении товара в заказ обновляется
+инкрементально. Для выдачи рекомендаций в каждом процессе держится
+компактный индекс в памяти. После полного пересчета он перечитывается
+сразу, а инкрементальные изменения подхватываются не чаще раза в
+SHOP_RECOMMENDATIONS_REFRESH_SECONDS, чтобы поток заказов не вызывал
+перечитывание таблицы на каждую позицию.
+"""
+import threading
+import time
+
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+
+from .cache import get_version, bump_version
+
+
+RECOMMENDATIONS_VERSION = 'recommendations'
+# Версия инкрементальных изменений (учитывается с задержкой)
+RECOMMENDATIONS_UPDATES_VERSION = 'recommendations:updates'
+
+
+def _top_k():
+    return getattr(settings, 'SHOP_RECOMMENDATIONS_TOP_K', 5)
+
+
+def co_occurrence_pairs(order_ids, product_ids):
+    """Разреженная матрица совместных покупок в формате COO
+
+    Принимает два параллельных массива (заказ, товар) и возвращает
+    (articles, rows, cols, counts): rows и cols - номера товаров в articles.
+    """
+    order_ids = np.asarray(order_ids, dtype=np.int64)
+    articles, product_idx = np.unique(np.asarray(product_ids, dtype=str), return_inverse=True)
+    empty = np.empty(0, dtype=np.int64)
+    if len(order_ids) == 0:
+        return articles, empty, empty, empty
+
+    # Группируем позиции по заказам
+    order = np.lexsort((product_idx, order_ids))
+    orders = order_ids[order]
+    products = product_idx[order].astype(np.int64)
+    starts = np.flatnonzero(np.r_[True, orders[1:] != orders[:-1]])
+    sizes = np.diff(np.r_[starts, len(orders)])
+
+    # Каждая позиция образует пары со всеми позициями своего заказа
+    group_size = np.repeat(sizes, sizes)
+    group_start = np.repeat(starts, sizes)
+    left = np.repeat(np.arange(len(orders)), group_size)
+    offsets = np.arange(len(left)) - np.repeat(np.cumsum(group_size) - group_size, group_size)
+    right = np.repeat(group_start, group_size) + offsets
+    distinct = left != right
+    left, right = products[left[distinct]], products[right[distinct]]
+
+    n = len(articles)
+    codes, counts = np.unique(left * n + right, return_counts=True)
+    return articles, codes // n, codes % n, counts
+
+
+def build_co_occurrence(batch_size=5000):
+    """Полностью пересчитать таблицу совместных покупок по истории заказов
+
+    Учитываются и рабочие, и архивные заказы (см. shop.archive).
+    """
+    from .models import ArchivedOrderItem, OrderItem, ProductCoOccurrence
+
+    items = list(OrderItem.objects.order_by().values_list('order_id', 'product_id'))
+    # Номера архивных заказов берутся со знаком минус, чтобы не совпасть с рабочими
+    items += [
+        (-order_id, product_id)
+        for order_id, product_id in ArchivedOrderItem.objects.order_by().values_list('order_id', 'product_id')
+    ]
+    order_ids, product_ids = zip(*items) if items else ((), ())
+    articles, rows, cols, counts = co_occurrence_pairs(order_ids, product_ids)
+    articles = articles.tolist()
+
+    with transaction.atomic():
+        ProductCoOccurrence.objects.all().delete()
+        ProductCoOccurrence.objects.bulk_create(
+            (
+                ProductCoOccurrence(
+                    product_id=articles[row], related_id=articles[col], count=count
+                )
+                for row, col, count in zip(rows.tolist(), cols.tolist(), counts.tolist())
+            ),
+            batch_size=batch_size,
+        )
+    bump_version(RECOMMENDATIONS_VERSION)
+    return len(counts)
+
+
+def record_order_item(item):
+    """Учесть новый товар в заказе: +1 ко всем парам с остальными товарами заказа
+
+    Удаление позиций инкрементально не учитывается - расхождение
+    устраняется периодическим запуском build_recommendations.
+    """
+    from .models import OrderItem, ProductCoOccurrence
+
+    others = list(
+        OrderItem.objects.filter(order_id=item.order_id)
+        .exclude(pk=item.pk)
+        .values_list('product_id', flat=True)
+    )
+    if not others:
+        return
+
+    product = item.product_id
+    with transaction.atomic():
+        for source, targets in [(product, others)] + [(other, [product]) for other in others]:
+            # Недостающие пары создаются с нулем; если ту же пару одновременно
+            # создал другой заказ, вставка пропускается, а не падает
+            ProductCoOccurrence.objects.bulk_create(
+                [ProductCoOccurrence(product_id=source, related_id=target, count=0) for target in targets],
+                ignore_conflicts=True,
+            )
+            ProductCoOccurrence.objects.filter(
+                product_id=source, related_id__in=targets
+            ).update(count=F('count') + 1)
+    bump_version(RECOMMENDATIONS_UPDATES_VERSION)
+
+
+class RelatedProductsIndex:
+    """Top-K связанных товаров в компактных массивах
+
+    Соседи товара лежат в neighbors[start:end] (номера в articles), уже
+    отсортированные по убыванию числа совместных покупок.
+    """
+
+    def __init__(self, rows, top_k):
+        # rows - (product_id, related_id), сгруппированные по product_id
+        # и отсортированные по убыванию count внутри группы
+        self.top_k = top_k
+        self._articles = []
+        self._spans = {}
+        numbers = {}
+        neighbors = []
+        for product_id, related_id in rows:
+            start, end = self._spans.get(product_id, (len(neighbors), len(neighbors)))
+            if end - start >= top_k:
+                continue
+            number = numbers.get(related_id)
+            if number is None:
+                number = numbers[related_id] = len(self._articles)
+                self._articles.append(related_id)
+            neighbors.append(number)
+            self._spans[product_id] = (start, end + 1)
+        self._neighbors = np.array(neighbors, dtype=np.int32)
+
+    def __len__(self):
+        return len(self._spans)
+
+    def related(self, article, k=None):
+        """Артикулы товаров, которые чаще всего покупают вместе с данным"""
+        span = self._spans.get(article)
+        if span is None:
+            return []
+        start, end = span
+        if k is not None:
+            end = min(end, start + k)
+        return [self._articles[number] for number in self._neighbors[start:end].tolist()]
+
+    def related_to_many(self, articles, k=None):
+        """Рекомендации для набора товаров (например, для заказа)"""
+        exclude = set(articles)
+        result = {}
+        # Сначала лучшие соседи каждого товара, затем следующие по рангу
+        lists = [self.related(article) for article in articles]
+        for rank in range(self.top_k):
+            for neighbors in lists:
+                if rank < len(neighbors) and neighbors[rank] not in exclude:
+                    result.setdefault(neighbors[rank], None)
+        result = list(result)
+        return result[:k] if k is not None else result
+
+
+_index = None
+_index_version = None
+_index_lock = threading.Lock()
+
+
+def _index_is_current(version):
+    if _index is None or _index_version[0] != version[0]:
+        return False
+    if _index_version[1] == version[1]:
+        return True
+    # Инкрементальные изменения подхватываются не чаще раза в интервал
+    refresh = getattr(settings, 'SHOP_RECOMMENDATIONS_REFRESH_SECONDS', 300)
+    return time.monotonic() - _index_version[2] < refresh
+
+
+def get_related_index():
+    """Индекс рекомендаций текущего процесса (перечитывается после изменений)"""
+    global _index, _index_version
+    from .models import ProductCoOccurrence
+
+    version = (get_version(RECOMMENDATIONS_VERSION), get_version(RECOMMENDATIONS_UPDATES_VERSION))
+    if _index_is_current(version):
+        return _index
+    with _index_lock:
+        if not _index_is_current(version):
+            rows = ProductCoOccurrence.objects.order_by(
+                'product_id', '-count', 'related_id'
+            ).values_list('product_id', 'related_id')
+            _index = RelatedProductsIndex(rows.iterator(chunk_size=10000), _top_k())
+            _index_version = version + (time.monotonic(),)
+    return _index
+
+
+def related_products(article, k=None):
+    """Top-K артикулов, которые часто покупают вместе с товаром"""
+    return get_related_index().related(article, k)
+
+
+def related_to_order(articles, k=None):
+    """Рекомендации к заказу: товары, часто покупаемые вместе с его позициями"""
+    return get_related_index().related_to_many(articles, k)
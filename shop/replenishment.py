@@ -0,0 +1,133 @@
+"""Отчет о пополнении склада
+
+Скорость продаж каждого товара считается по скользящим окнам на массивах
+NumPy, собранных из одной выборки позиций заказов, без запросов на каждый
+товар. По скорости оценивается, через сколько дней товар закончится, и
+рассчитывается рекомендуемый объем дозаказа с группировкой по поставщикам.
+"""
+from datetime import timedelta, timezone as dt_timezone
+
+import numpy as np
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import CharField
+from django.db.models.functions import Cast
+from django.utils import timezone
+
+
+CACHE_KEY = 'shop:replenishment'
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def sales_by_window(product_idx, quantities, ages, windows, size):
+    """Продано единиц каждого товара за каждое окно: массив (len(windows), size)"""
+    result = np.zeros((len(windows), size))
+    for row, window in enumerate(windows):
+        recent = ages < window
+        result[row] = np.bincount(product_idx[recent], weights=quantities[recent], minlength=size)
+    return result
+
+
+def compute_replenishment(now=None, windows=None, velocity_window=None,
+                          lead_time_days=None, cover_days=None):
+    """Рассчитать отчет о пополнении по всем товарам"""
+    from .models import Product, OrderItem
+
+    now = now or timezone.now()
+    windows = tuple(windows or _setting('SHOP_REPLENISHMENT_WINDOWS', (7, 30, 90)))
+    velocity_window = velocity_window or _setting('SHOP_REPLENISHMENT_VELOCITY_WINDOW', 30)
+    lead_time_days = lead_time_days if lead_time_days is not None else _setting('SHOP_REPLENISHMENT_LEAD_TIME_DAYS', 14)
+    cover_days = cover_days if cover_days is not None else _setting('SHOP_REPLENISHMENT_COVER_DAYS', 30)
+    if velocity_window not in windows:
+        windows = tuple(sorted(windows + (velocity_window,)))
+
+    products = list(
+        Product.objects.order_by()
+        .values_list('article', 'name', 'quantity', 'supplier__name')
+    )
+    report = {
+        'generated_at': now,
+        'windows': windows,
+        'velocity_window': velocity_window,
+        'lead_time_days': lead_time_days,
+        'cover_days': cover_days,
+        'products_count': len(products),
+        'suppliers': [],
+    }
+    if not products:
+        return report
+
+    articles, names, stock, suppliers = zip(*products)
+    articles = np.array(articles)
+    stock = np.array(stock, dtype=np.float64)
+
+    # Одна выборка продаж за самое длинное окно, отмененные заказы не учитываются
+    since = now - timedelta(days=max(windows))
+    # Дата заказа выбирается текстом: SQLite хранит ее в UTC без зоны, и NumPy
+    # разбирает весь столбец сразу, без создания datetime на каждую строку
+    sales = list(
+        OrderItem.objects.order_by()
+        .filter(order__order_date__gte=since)
+        .exclude(order__status='cancelled')
+        .annotate(ordered_at=Cast('order__order_date', CharField()))
+        .values_list('product_id', 'quantity', 'ordered_at')
+    )
+    if sales:
+        sold_articles, quantities, dates = zip(*sales)
+        sorter = np.argsort(articles)
+        product_idx = sorter[np.searchsorted(articles, np.array(sold_articles), sorter=sorter)]
+        quantities = np.array(quantities, dtype=np.float64)
+        now_utc = np.datetime64(now.astimezone(dt_timezone.utc).replace(tzinfo=None), 'us')
+        ages = (now_utc - np.array(dates, dtype='datetime64[us]')) / np.timedelta64(1, 'D')
+    else:
+        product_idx = np.empty(0, dtype=np.int64)
+        quantities = ages = np.empty(0)
+
+    sold = sales_by_window(product_idx, quantities, ages, windows, len(articles))
+    velocities = sold / np.array(windows, dtype=np.float64)[:, None]
+    velocity = velocities[windows.index(velocity_window)]
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        days_left = np.where(velocity > 0, stock / velocity, np.inf)
+    reorder_qty = np.ceil(np.maximum(velocity * (lead_time_days + cover_days) - stock, 0))
+    needs_reorder = (days_left <= lead_time_days) & (reorder_qty > 0)
+
+    # Группировка по поставщикам
+    supplier_names, supplier_idx = np.unique(np.array(suppliers), return_inverse=True)
+    totals = np.bincount(supplier_idx, weights=np.where(needs_reorder, reorder_qty, 0),
+                         minlength=len(supplier_names))
+    order = np.lexsort((days_left, supplier_idx))
+    order = order[needs_reorder[order]]
+
+    groups = {}
+    for i in order.tolist():
+        groups.setdefault(int(supplier_idx[i]), []).append({
+            'article': str(articles[i]),
+            'name': names[i],
+            'quantity': int(stock[i]),
+            'velocities': [round(float(v), 3) for v in velocities[:, i]],
+            'velocity': round(float(velocity[i]), 3),
+            'days_until_stockout': round(float(days_left[i]), 1),
+            'reorder_quantity': int(reorder_qty[i]),
+        })
+    report['suppliers'] = [
+        {
+            'name': str(supplier_names[s]),
+            'total_reorder_quantity': int(totals[s]),
+            'products': rows,
+        }
+        for s, rows in groups.items()
+    ]
+    return report
+
+
+def get_replenishment_report(refresh=False):
+    """Отчет о пополнении из кеша (пересчитывается не чаще раза в таймаут)"""
+    report = None if refresh else cache.get(CACHE_KEY)
+    if report is None:
+        report = compute_replenishment()
+        cache.set(CACHE_KEY, report, _setting('SHOP_REPLENISHMENT_CACHE_SECONDS', 600))
+    return report
@@ -0,0 +1,48 @@
+"""Сессии в общем кеше с отложенной записью в БД
+
+Движок основан на cached_db: сессия читается из кеша (алиас
+SESSION_CACHE_ALIAS), а к таблице django_session обращается только при
+промахе. Изменения сессии всегда сразу попадают в кеш, а в БД пишутся
+при сохранении, если с прошлой записи в БД прошло не меньше
+SHOP_SESSION_DB_WRITE_INTERVAL секунд, поэтому частые изменения (например,
+сообщения или корзина) не дают записи в SQLite на каждый запрос. Новая
+сессия (вход) записывается в БД сразу.
+
+Изменение внутри интервала хранится только в кеше и попадет в БД лишь при
+следующем сохранении сессии после окончания интервала. Если такого
+сохранения не будет, а кеш потеряет сессию (вытеснение, перезапуск), она
+восстановится из БД без этих изменений. Поэтому отложенная запись
+включается только вместе с общим кешем, не вытесняющим сессии (Redis);
+при интервале 0 каждое изменение пишется в БД сразу.
+
+Подключение: SESSION_ENGINE = 'shop.sessions'.
+"""
+from django.conf import settings
+from django.contrib.sessions.backends.cached_db import SessionStore as CachedDBStore
+
+
+class SessionStore(CachedDBStore):
+    """Сессия в кеше, запись в БД не чаще заданного интервала"""
+    db_write_suffix = ':db'
+
+    def _db_write_key(self, session_key):
+        return self.cache_key_prefix + session_key + self.db_write_suffix
+
+    def _db_write_due(self):
+        interval = getattr(settings, 'SHOP_SESSION_DB_WRITE_INTERVAL', 0)
+        if not interval:
+            return True
+        # Метка живет interval секунд: пока она есть, в БД не пишем
+        return self._cache.add(self._db_write_key(self.session_key), 1, interval)
+
+    def save(self, must_create=False):
+        if must_create or self.session_key is None or self._db_write_due():
+            super().save(must_create)
+            return
+        self._cache.set(self.cache_key, self._session, self.get_expiry_age())
+
+    def delete(self, session_key=None):
+        super().delete(session_key)
+        session_key = session_key or self.session_key
+        if session_key:
+            self._cache.delete(self._db_write_key(session_key))
@@ -0,0 +1,48 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from .cache import bump_version, CATALOGUE_VERSION
+from .geo import DELIVERY_POINTS_VERSION
+from .models import Category, Manufacturer, Supplier, Product, DeliveryPoint, Order, OrderItem
+from .recommendations import record_order_item
+from .totals import update_order_totals
+
+
+@receiver([post_save, post_delete], sender=DeliveryPoint)
+def delivery_point_changed(sender, **kwargs):
+    """Пересобрать пространственный индекс после изменения пункта выдачи"""
+    bump_version(DELIVERY_POINTS_VERSION)
+
+
+@receiver([post_save, post_delete], sender=Category)
+@receiver([post_save, post_delete], sender=Manufacturer)
+@receiver([post_save, post_delete], sender=Supplier)
+def lookup_changed(sender, **kwargs):
+    """Сбросить кешированные списки выбора справочника"""
+    bump_version(f'choices:{sender._meta.model_name}')
+    bump_version(CATALOGUE_VERSION)
+
+
+@receiver([post_save, post_delete], sender=Product)
+def product_changed(sender, **kwargs):
+    """Сбросить кешированные страницы каталога"""
+    bump_version(CATALOGUE_VERSION)
+
+
+@receiver(post_save, sender=OrderItem)
+def order_item_saved(sender, instance, created, raw=False, **kwargs):
+    """Пересчитать итоги заказа и обновить матрицу совместных покупок"""
+    if raw:
+        return
+    update_order_totals([instance.order_id])
+    if created:
+        record_order_item(instance)
+
+
+@receiver(post_delete, sender=OrderItem)
+def order_item_deleted(sender, instance, origin=None, **kwargs):
+    """Пересчитать итоги заказа после удаления позиции"""
+    # При удалении самого заказа позиции удаляются каскадом - пересчитывать нечего
+    if isinstance(origin, Order) or getattr(origin, 'model', None) is Order:
+        return
+    update_order_totals([instance.order_id])
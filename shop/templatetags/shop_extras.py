@@ -0,0 +1,21 @@
+from django import template
+
+from shop.recommendations import get_related_index
+
+
+register = template.Library()
+
+INDEX_KEY = 'shop_extras.related_index'
+
+
+@register.simple_tag(takes_context=True)
+def related_products(context, article, k=None):
+    """Артикулы товаров, которые часто покупают вместе с данным
+
+    Индекс рекомендаций берется один раз на отрисовку шаблона, а не на
+    каждую строку списка.
+    """
+    index = context.render_context.get(INDEX_KEY)
+    if index is None:
+        index = context.render_context[INDEX_KEY] = get_related_index()
+    return index.related(article, k)
@@ -0,0 +1,51 @@
+"""Запуск тестов с кешами в памяти процесса
+
+Кеши проекта общие (файловый кеш в SHOP_CACHE_DIR или Redis), поэтому
+тесты, очищающие кеш, стерли бы страницы, сессии и счетчики входа
+работающего сервера, а параллельные процессы тестов мешали бы друг другу.
+На время тестов каждый алиас CACHES заменяется на LocMemCache: свой кеш у
+каждого процесса, в том числе у процессов --parallel.
+
+Подключение: TEST_RUNNER = 'shop.tests.runner.IsolatedCacheRunner'.
+"""
+from django.conf import settings
+from django.test.runner import DiscoverRunner, ParallelTestSuite
+from django.test.utils import override_settings
+
+
+def isolated_caches():
+    """Настройки с кешами в памяти процесса вместо общих"""
+    return override_settings(
+        CACHES={
+            alias: {
+                'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+                'LOCATION': f'shop-tests-{alias}',
+            }
+            for alias in settings.CACHES
+        },
+        # Предупреждение о необщем кеше к тестам не относится
+        SILENCED_SYSTEM_CHECKS=[*settings.SILENCED_SYSTEM_CHECKS, 'shop.W001'],
+    )
+
+
+def _isolate_worker_caches(*args):
+    # Процессы, запущенные через spawn, заново читают настройки проекта
+    isolated_caches().enable()
+
+
+class IsolatedCacheParallelSuite(ParallelTestSuite):
+    process_setup = _isolate_worker_caches
+
+
+class IsolatedCacheRunner(DiscoverRunner):
+    """DiscoverRunner, изолирующий кеши тестов от кешей сервера"""
+    parallel_test_suite = IsolatedCacheParallelSuite
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self._isolated_caches = isolated_caches()
+        self._isolated_caches.enable()
+
+    def teardown_test_environment(self, **kwargs):
+        self._isolated_caches.disable()
+        super().teardown_test_environment(**kwargs)
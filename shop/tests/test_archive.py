@@ -0,0 +1,114 @@
+"""Архивирование заказов и чтение архива в списке заказов"""
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import IntegrityError
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from shop.archive import archive_orders, newest_archived_date
+from shop.models import (
+    Category, Manufacturer, Supplier, Product, UserProfile,
+    Order, OrderItem, ArchivedOrder, ArchivedOrderItem, ProductCoOccurrence,
+)
+from shop.recommendations import build_co_occurrence
+
+
+class ArchiveTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        user = User.objects.create_user(username='manager@example.com', password='secret-password')
+        UserProfile.objects.create(user=user, role='manager', full_name='Менеджер')
+        cls.user = user
+        cls.product = Product.objects.create(
+            article='A112T4', name='Ботинки', price=Decimal('4990'),
+            supplier=Supplier.objects.create(name='Kari'),
+            manufacturer=Manufacturer.objects.create(name='Kari'),
+            category=Category.objects.create(name='Женская обувь'),
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.now = timezone.now()
+        self.client.force_login(self.user)
+
+    def create_order(self, number, days_ago, status='completed'):
+        order = Order.objects.create(
+            order_number=number, order_date=self.now - timedelta(days=days_ago),
+            delivery_date=self.now, customer_name='Клиент', code=901, status=status,
+        )
+        OrderItem.objects.create(order=order, product=self.product, quantity=2)
+        return order
+
+    def listed(self, **params):
+        response = self.client.get(reverse('shop:orders_list'), params)
+        return sorted(order.order_number for order in response.context['orders'])
+
+    def day(self, days_ago):
+        return (self.now - timedelta(days=days_ago)).date().isoformat()
+
+    def test_moves_old_finished_orders_in_batches(self):
+        for number in range(5):
+            self.create_order(number, 400)
+        self.create_order(10, 400, status='pending')
+        self.create_order(11, 10)
+
+        batches = list(archive_orders(days=365, batch_size=2))
+
+        self.assertEqual(batches, [(2, 2), (2, 2), (1, 1)])
+        self.assertEqual(sorted(Order.objects.values_list('order_number', flat=True)), [10, 11])
+        self.assertEqual(ArchivedOrderItem.objects.count(), 5)
+        archived = ArchivedOrder.objects.get(order_number=0)
+        self.assertEqual((archived.total_units, archived.items.get().line_total), (2, Decimal('9980.00')))
+
+    def test_list_reads_archive_for_any_date_filter(self):
+        self.create_order(1, 800)
+        self.create_order(2, 90)
+        self.create_order(3, 5)
+        # Архивируем раньше срока по умолчанию
+        list(archive_orders(days=30))
+        self.assertEqual(newest_archived_date().date(), (self.now - timedelta(days=90)).date())
+
+        self.assertEqual(self.listed(date_to=self.day(700)), [1])
+        self.assertEqual(self.listed(date_from=self.day(100)), [2, 3])
+        self.assertEqual(self.listed(date_from=self.day(10)), [3])
+        # Без фильтра по дате - только рабочие заказы
+        self.assertEqual(self.listed(), [3])
+
+    def test_edge_dates_mean_no_bound(self):
+        self.create_order(1, 5)
+        self.assertEqual(self.listed(date_from='0001-01-01'), [1])
+        self.assertEqual(self.listed(date_to='9999-12-31'), [1])
+        self.assertEqual(self.listed(date_from='0001-01-01', date_to='9999-12-31'), [1])
+
+    def test_rebuilt_recommendations_keep_archived_history(self):
+        other = Product.objects.create(
+            article='F635R4', name='Туфли', price=Decimal('3244'), supplier=self.product.supplier,
+            manufacturer=self.product.manufacturer, category=self.product.category,
+        )
+        for number, days_ago in ((1, 400), (2, 5)):
+            OrderItem.objects.create(order=self.create_order(number, days_ago), product=other)
+        list(archive_orders(days=365))
+
+        build_co_occurrence()
+
+        self.assertEqual(
+            sorted(ProductCoOccurrence.objects.values_list('product_id', 'related_id', 'count')),
+            [('A112T4', 'F635R4', 2), ('F635R4', 'A112T4', 2)],
+        )
+
+    def test_conflict_rolls_back_the_batch(self):
+        self.create_order(1, 400)
+        ArchivedOrder.objects.create(
+            id=999, order_number=1, order_date=self.now, delivery_date=self.now,
+            customer_name='Клиент', code=901, status='completed',
+        )
+
+        with self.assertRaises(IntegrityError):
+            list(archive_orders(days=365))
+        self.assertTrue(Order.objects.filter(order_number=1).exists())
+        self.assertEqual(OrderItem.objects.count(), 1)
@@ -0,0 +1,130 @@
+"""Вход: ограничение попыток, пересчет хешей паролей, сессии в кеше"""
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.contrib.sessions.models import Session
+from django.core.cache import cache, caches
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+
+from shop.checks import check_session_write_behind
+from shop.sessions import SessionStore
+
+
+@override_settings(
+    PASSWORD_HASHERS=['shop.hashers.PBKDF2PasswordHasher', 'django.contrib.auth.hashers.MD5PasswordHasher'],
+    SHOP_PASSWORD_ITERATIONS=1000,
+    SHOP_LOGIN_THROTTLE={'IP_LIMIT': 8, 'USERNAME_LIMIT': 3, 'WINDOW': 300, 'CACHE': 'throttle'},
+)
+class LoginTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='admin@example.com', password='secret-password')
+
+    def setUp(self):
+        cache.clear()
+        caches['throttle'].clear()
+
+    def post(self, username, password, **extra):
+        return self.client.post(reverse('shop:login'), {'username': username, 'password': password}, **extra)
+
+    def test_username_is_blocked_before_password_check(self):
+        for _ in range(3):
+            self.assertEqual(self.post('admin@example.com', 'wrong').status_code, 200)
+        # Даже верный пароль не проверяется: ни одного запроса к БД
+        with self.assertNumQueries(0):
+            response = self.post('admin@example.com', 'secret-password')
+        self.assertEqual(response.status_code, 429)
+
+    def test_ip_is_blocked_across_usernames(self):
+        for i in range(8):
+            self.post(f'user{i}@example.com', 'wrong')
+        self.assertEqual(self.post('admin@example.com', 'secret-password').status_code, 429)
+        # С другого адреса вход работает
+        response = self.post('admin@example.com', 'secret-password', REMOTE_ADDR='10.0.0.2')
+        self.assertRedirects(response, reverse('shop:dashboard'))
+
+    def test_counters_survive_page_cache_eviction(self):
+        for _ in range(3):
+            self.post('admin@example.com', 'wrong')
+        cache.clear()
+        self.assertEqual(self.post('admin@example.com', 'secret-password').status_code, 429)
+
+    def test_successful_login_resets_username_counter(self):
+        for _ in range(2):
+            self.post('admin@example.com', 'wrong')
+        self.post('admin@example.com', 'secret-password')
+        self.client.logout()
+        for _ in range(2):
+            self.post('admin@example.com', 'wrong')
+        self.assertRedirects(self.post('admin@example.com', 'secret-password'), reverse('shop:dashboard'))
+
+    def test_old_hash_is_upgraded_on_login(self):
+        self.user.password = make_password('secret-password', hasher='md5')
+        self.user.save(update_fields=['password'])
+        self.post('admin@example.com', 'secret-password')
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.password.startswith('pbkdf2_sha256$1000$'))
+
+    @override_settings(SHOP_PASSWORD_ITERATIONS=2000)
+    def test_iterations_change_rehashes_password(self):
+        self.post('admin@example.com', 'secret-password')
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.password.startswith('pbkdf2_sha256$2000$'))
+
+
+class SessionStoreTests(TestCase):
+
+    def setUp(self):
+        caches['sessions'].clear()
+
+    def stored(self, session_key):
+        return SessionStore().decode(Session.objects.get(session_key=session_key).session_data)
+
+    @override_settings(SHOP_SESSION_DB_WRITE_INTERVAL=60)
+    def test_changes_within_interval_stay_in_cache(self):
+        session = SessionStore()
+        session['step'] = 1
+        session.create()
+        session['step'] = 2
+        session.save()
+        session['step'] = 3
+        session.save()
+
+        self.assertEqual(self.stored(session.session_key)['step'], 2)
+        with self.assertNumQueries(0):
+            self.assertEqual(SessionStore(session.session_key)['step'], 3)
+
+    @override_settings(SHOP_SESSION_DB_WRITE_INTERVAL=0)
+    def test_zero_interval_writes_every_change(self):
+        session = SessionStore()
+        session.create()
+        for step in range(3):
+            session['step'] = step
+            session.save()
+        self.assertEqual(self.stored(session.session_key)['step'], 2)
+
+    @override_settings(SHOP_SESSION_DB_WRITE_INTERVAL=60)
+    def test_session_missing_from_cache_is_loaded_from_db(self):
+        session = SessionStore()
+        session['step'] = 1
+        session.create()
+        caches['sessions'].clear()
+        self.assertEqual(SessionStore(session.session_key)['step'], 1)
+
+
+class SessionWriteBehindCheckTests(SimpleTestCase):
+
+    @override_settings(
+        SHOP_SESSION_DB_WRITE_INTERVAL=60,
+        CACHES={
+            'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'},
+            'sessions': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+        },
+    )
+    def test_warns_about_write_behind_on_process_local_cache(self):
+        self.assertEqual([warning.id for warning in check_session_write_behind(None)], ['shop.W002'])
+
+    @override_settings(SHOP_SESSION_DB_WRITE_INTERVAL=0)
+    def test_write_through_passes(self):
+        self.assertEqual(check_session_write_behind(None), [])
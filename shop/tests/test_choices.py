@@ -0,0 +1,91 @@
+"""Кешируемые списки выбора справочников и поиск по мере ввода"""
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from shop.choices import AutocompleteInput, ChoiceProvider
+from shop.forms import ProductForm
+from shop.models import Category, Supplier, UserProfile
+
+
+class ChoiceProviderTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        for name in ('Kari', 'Обувь для вас', 'Karisma'):
+            Supplier.objects.create(name=name)
+
+    def setUp(self):
+        cache.clear()
+        self.provider = ChoiceProvider('supplier', 'shop.Supplier', 'name')
+
+    def names(self):
+        return [label for pk, label in self.provider.choices()]
+
+    def test_choices_are_cached_until_version_changes(self):
+        self.assertEqual(self.names(), ['Kari', 'Karisma', 'Обувь для вас'])
+        with self.assertNumQueries(0):
+            self.assertEqual(len(self.provider.choices()), 3)
+
+        # Сохранение увеличивает версию справочника через сигнал
+        supplier = Supplier.objects.create(name='Ботинки.ру')
+        self.assertEqual(self.names(), ['Kari', 'Karisma', 'Ботинки.ру', 'Обувь для вас'])
+        self.assertEqual(self.provider.label(supplier.pk), 'Ботинки.ру')
+
+        supplier.delete()
+        self.assertEqual(self.names(), ['Kari', 'Karisma', 'Обувь для вас'])
+
+    def test_search_by_substring_with_limit(self):
+        self.assertEqual([label for pk, label in self.provider.search(' KAR ')], ['Kari', 'Karisma'])
+        self.assertEqual(len(self.provider.search('kar', limit=1)), 1)
+        self.assertEqual(self.provider.search('нет такого'), [])
+
+    def test_autocomplete_above_threshold(self):
+        Category.objects.create(name='Женская обувь')
+        with override_settings(SHOP_CHOICES_AUTOCOMPLETE_THRESHOLD=3):
+            form = ProductForm()
+            self.assertNotIsInstance(form.fields['supplier'].widget, AutocompleteInput)
+        with override_settings(SHOP_CHOICES_AUTOCOMPLETE_THRESHOLD=2):
+            form = ProductForm()
+            self.assertIsInstance(form.fields['supplier'].widget, AutocompleteInput)
+            self.assertNotIsInstance(form.fields['category'].widget, AutocompleteInput)
+            self.assertIn(reverse('shop:lookup', args=['supplier']), form.as_p())
+
+
+class LookupViewTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        for i in range(30):
+            Supplier.objects.create(name=f'Поставщик {i:02d}')
+        Supplier.objects.create(name='Kari')
+        cls.users = {}
+        for role in ('client', 'manager', 'admin'):
+            user = User.objects.create_user(username=f'{role}@example.com', password='secret-password')
+            UserProfile.objects.create(user=user, role=role, full_name=role)
+            cls.users[role] = user
+
+    def setUp(self):
+        cache.clear()
+
+    def lookup(self, role, name='supplier', **params):
+        self.client.force_login(self.users[role])
+        return self.client.get(reverse('shop:lookup', args=[name]), params)
+
+    def test_filters_and_limits_results(self):
+        response = self.lookup('admin', q='kar')
+        self.assertEqual([item['text'] for item in response.json()['results']], ['Kari'])
+        # Не больше 20 вариантов
+        self.assertEqual(len(self.lookup('admin', q='поставщик').json()['results']), 20)
+
+    def test_unknown_table(self):
+        self.assertEqual(self.lookup('admin', name='users').status_code, 404)
+
+    def test_only_admin_has_access(self):
+        for role in ('client', 'manager'):
+            with self.subTest(role=role):
+                self.assertEqual(self.lookup(role, q='kar').status_code, 403)
+        self.client.logout()
+        response = self.client.get(reverse('shop:lookup', args=['supplier']))
+        self.assertEqual(response.status_code, 302)
@@ -0,0 +1,123 @@
+"""Поиск ближайших пунктов выдачи и импорт пунктов"""
+import io
+import random
+import shutil
+import tempfile
+from pathlib import Path
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from openpyxl import Workbook
+
+from shop.checks import check_shared_cache
+from shop.geo import GeocodeTable, SpatialIndex, haversine_km, parse_postcode
+from shop.models import DeliveryPoint, UserProfile
+
+
+class SpatialIndexTests(SimpleTestCase):
+
+    def brute_force(self, points, latitude, longitude, n):
+        distances = sorted(
+            (haversine_km(latitude, longitude, lat, lon), key) for key, lat, lon in points
+        )
+        return [key for distance, key in distances[:n]]
+
+    def test_matches_brute_force(self):
+        rng = random.Random(42)
+        # Скопление точек по России и разреженные точки по всему миру
+        points = [(i, rng.uniform(43, 68), rng.uniform(20, 170)) for i in range(2500)]
+        points += [(2500 + i, rng.uniform(-90, 90), rng.uniform(-180, 180)) for i in range(500)]
+        for cell_km in (5, 50, 500):
+            index = SpatialIndex(points, cell_km=cell_km)
+            for _ in range(50):
+                latitude, longitude = rng.uniform(-90, 90), rng.uniform(-180, 180)
+                n = rng.choice((1, 5, 20))
+                found = index.nearest(latitude, longitude, n)
+                self.assertEqual([key for key, km in found], self.brute_force(points, latitude, longitude, n))
+
+    def test_distances_are_in_km(self):
+        index = SpatialIndex([('moscow', 55.7558, 37.6173)])
+        (key, km), = index.nearest(59.9343, 30.3351, 1)
+        self.assertEqual(key, 'moscow')
+        self.assertAlmostEqual(km, haversine_km(59.9343, 30.3351, 55.7558, 37.6173), places=6)
+
+    def test_empty_index(self):
+        self.assertEqual(SpatialIndex([]).nearest(55, 37, 5), [])
+
+    def test_geocode_table_falls_back_to_postcode_prefix(self):
+        table = GeocodeTable([('420151', 55.8, 49.1), ('625', 57.1, 65.5)])
+        self.assertEqual(table.geocode('420151, г. Лесной, ул. Вишневая, 32'), (55.8, 49.1))
+        self.assertEqual(table.lookup('625283'), (57.1, 65.5))
+        self.assertIsNone(table.lookup('190949'))
+        self.assertEqual(parse_postcode('г. Лесной, ул. Вишневая'), '')
+
+
+class NearestViewTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        user = User.objects.create_user(username='manager@example.com', password='secret-password')
+        UserProfile.objects.create(user=user, role='manager', full_name='Менеджер')
+        cls.user = user
+        DeliveryPoint.objects.create(address='420151, г. Лесной', postcode='420151', latitude=55.8, longitude=49.1)
+        DeliveryPoint.objects.create(address='625283, г. Тюмень', postcode='625283', latitude=57.1, longitude=65.5)
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def test_nearest_by_coordinates(self):
+        response = self.client.get(reverse('shop:delivery_points_nearest'), {'lat': 56, 'lon': 50, 'n': 1})
+        self.assertEqual([point['address'] for point in response.json()['points']], ['420151, г. Лесной'])
+
+    def test_non_finite_and_out_of_range_coordinates_are_rejected(self):
+        for lat, lon in (('nan', '50'), ('55', 'inf'), ('-inf', '50'), ('91', '50'), ('55', '181')):
+            response = self.client.get(reverse('shop:delivery_points_nearest'), {'lat': lat, 'lon': lon})
+            self.assertEqual(response.status_code, 400, (lat, lon))
+
+
+class ImportDeliveryPointsTests(TestCase):
+
+    def setUp(self):
+        self.directory = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.directory)
+        workbook = Workbook()
+        for address in ('420151, г. Лесной, ул. Вишневая, 32', '625283, г. Тюмень, ул. Победы, 46'):
+            workbook.active.append([address])
+        self.file = self.directory / 'points.xlsx'
+        workbook.save(self.file)
+
+    def test_imports_addresses_without_geocode_table(self):
+        output = io.StringIO()
+        call_command('import_delivery_points', '--file', str(self.file),
+                     '--geocode-table', str(self.directory / 'missing.csv'), stdout=output)
+
+        self.assertIn('без координат', output.getvalue())
+        self.assertEqual(
+            sorted(DeliveryPoint.objects.values_list('postcode', 'latitude')),
+            [('420151', None), ('625283', None)],
+        )
+
+    def test_geocodes_with_table(self):
+        table = self.directory / 'geocode.csv'
+        table.write_text('postcode,latitude,longitude\n420151,55.8,49.1\n', encoding='utf-8')
+        call_command('import_delivery_points', '--file', str(self.file),
+                     '--geocode-table', str(table), stdout=io.StringIO())
+
+        self.assertEqual(DeliveryPoint.objects.get(postcode='420151').latitude, 55.8)
+        self.assertIsNone(DeliveryPoint.objects.get(postcode='625283').latitude)
+
+
+class SharedCacheCheckTests(SimpleTestCase):
+
+    @override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+    def test_warns_about_process_local_cache(self):
+        self.assertEqual([warning.id for warning in check_shared_cache(None)], ['shop.W001'])
+
+    @override_settings(CACHES={'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': tempfile.gettempdir(),
+    }})
+    def test_shared_cache_passes(self):
+        self.assertEqual(check_shared_cache(None), [])
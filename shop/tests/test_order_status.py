@@ -0,0 +1,79 @@
+"""Отмена заказов, не полученных в срок"""
+import io
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock
+
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils import timezone
+
+from shop import order_status
+from shop.models import Category, Manufacturer, Supplier, Product, Order, OrderItem
+from shop.order_status import expire_overdue_orders
+
+
+class ExpireOrdersTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.product = Product.objects.create(
+            article='A112T4', name='Ботинки', price=Decimal('4990'), quantity=6,
+            supplier=Supplier.objects.create(name='Kari'),
+            manufacturer=Manufacturer.objects.create(name='Kari'),
+            category=Category.objects.create(name='Женская обувь'),
+        )
+
+    def setUp(self):
+        self.now = timezone.now()
+
+    def create_order(self, number, delivered_days_ago, status='pending'):
+        order = Order.objects.create(
+            order_number=number, order_date=self.now - timedelta(days=delivered_days_ago + 3),
+            delivery_date=self.now - timedelta(days=delivered_days_ago),
+            customer_name='Клиент', code=901, status=status,
+        )
+        OrderItem.objects.create(order=order, product=self.product, quantity=2)
+        return order
+
+    def statuses(self):
+        return dict(Order.objects.values_list('order_number', 'status'))
+
+    def test_cancels_expired_orders_in_chunks(self):
+        for number in range(5):
+            self.create_order(number, 30)
+        self.create_order(10, 30, status='completed')
+        self.create_order(11, 5)
+
+        metrics = expire_overdue_orders(now=self.now, days=14, chunk_size=2)
+
+        self.assertEqual((metrics['chunks'], metrics['orders'], metrics['overdue']), (3, 5, 1))
+        self.assertEqual(self.statuses(), {**{n: 'cancelled' for n in range(5)}, 10: 'completed', 11: 'pending'})
+        # Товар при оформлении не резервируется, остаток не меняется
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.quantity, 6)
+
+    def test_empty_rechecked_chunk_does_not_stop_the_run(self):
+        for number in range(4):
+            self.create_order(number, 30)
+        # Первую порцию успели завершить вручную после выборки кандидатов
+        Order.objects.filter(order_number__in=[0, 1]).update(status='completed')
+        stale = Order.objects.filter(order_number__in=[0, 1])
+        real = order_status.expired_orders
+        selections = iter([stale])
+
+        def expired_orders(expire_before):
+            return next(selections, None) or real(expire_before)
+
+        with mock.patch.object(order_status, 'expired_orders', side_effect=expired_orders):
+            metrics = expire_overdue_orders(now=self.now, days=14, chunk_size=2)
+
+        self.assertEqual((metrics['chunks'], metrics['orders']), (2, 2))
+        self.assertEqual(self.statuses(), {0: 'completed', 1: 'completed', 2: 'cancelled', 3: 'cancelled'})
+
+    def test_dry_run_changes_nothing(self):
+        self.create_order(1, 30)
+        output = io.StringIO()
+        call_command('expire_orders', '--dry-run', stdout=output)
+        self.assertIn('Будет отменено заказов: 1', output.getvalue())
+        self.assertEqual(self.statuses(), {1: 'pending'})
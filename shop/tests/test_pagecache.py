@@ -0,0 +1,110 @@
+"""Кеш страниц stale-while-revalidate"""
+import os
+import shutil
+import tempfile
+import threading
+import time
+
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, override_settings
+
+from shop.cache import bump_version
+from shop.pagecache import _add_file_lock, _cache_key, _delete_lock, stale_while_revalidate
+
+
+class PageCacheTests(SimpleTestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.builds = 0
+        self.delay = 0
+        self.view = stale_while_revalidate('test_page', versions=('test:page',))(self.page)
+
+    def page(self, request):
+        self.builds += 1
+        number = self.builds
+        time.sleep(self.delay)
+        return HttpResponse(f'page {number}')
+
+    def get(self, **headers):
+        request = RequestFactory().get('/page/', **headers)
+        request.user = AnonymousUser()
+        return self.view(request)
+
+    def test_conditional_get_returns_not_modified(self):
+        etag = self.get()['ETag']
+        response = self.get(HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+        self.assertEqual(self.builds, 1)
+
+    def test_stale_page_is_served_while_rebuilt_in_background(self):
+        self.assertEqual(self.get().content, b'page 1')
+        bump_version('test:page')
+
+        # Данные изменились: сразу отдается старая страница, новая строится в фоне
+        self.assertEqual(self.get().content, b'page 1')
+        deadline = time.monotonic() + 5
+        while cache.get(_cache_key('test_page', ''))['content'] != b'page 2' and time.monotonic() < deadline:
+            time.sleep(0.02)
+        self.assertEqual(self.get().content, b'page 2')
+        self.assertEqual(self.builds, 2)
+
+    def test_concurrent_misses_build_the_page_once(self):
+        self.delay = 0.3
+        barrier = threading.Barrier(8)
+        contents = []
+
+        def request():
+            barrier.wait()
+            contents.append(self.get().content)
+
+        threads = [threading.Thread(target=request) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(self.builds, 1)
+        self.assertEqual(contents, [b'page 1'] * 8)
+
+
+class FileLockTests(SimpleTestCase):
+
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        settings = override_settings(CACHES={'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': directory,
+        }})
+        settings.enable()
+        self.addCleanup(settings.disable)
+        self.directory = directory
+
+    def test_only_one_concurrent_acquire_succeeds(self):
+        barrier = threading.Barrier(10)
+        results = []
+
+        def acquire():
+            barrier.wait()
+            results.append(_add_file_lock('shop:page:test', 30))
+
+        threads = [threading.Thread(target=acquire) for _ in range(10)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(sorted(results), [False] * 9 + [True])
+        _delete_lock('shop:page:test')
+        self.assertTrue(_add_file_lock('shop:page:test', 30))
+
+    def test_abandoned_lock_expires(self):
+        self.assertTrue(_add_file_lock('shop:page:test', 30))
+        lock, = (os.path.join(self.directory, name) for name in os.listdir(self.directory))
+        os.utime(lock, (time.time() - 60, time.time() - 60))
+        self.assertTrue(_add_file_lock('shop:page:test', 30))
+        self.assertFalse(_add_file_lock('shop:page:test', 30))
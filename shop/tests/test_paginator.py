@@ -0,0 +1,36 @@
+"""Оценка числа строк для пагинации админки"""
+import io
+from datetime import timedelta
+
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from shop.models import Order
+from shop.paginator import EstimatedCountPaginator, estimate_row_count
+
+
+class EstimatedCountTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        now = timezone.now()
+        Order.objects.bulk_create([
+            Order(order_number=i, order_date=now, delivery_date=now + timedelta(days=3),
+                  customer_name='Клиент', code=901)
+            for i in range(40)
+        ])
+
+    def test_no_estimate_before_analyze(self):
+        self.assertIsNone(estimate_row_count(Order))
+
+    @override_settings(SHOP_ESTIMATED_COUNT_THRESHOLD=10)
+    def test_analyze_enables_estimate(self):
+        call_command('analyze_tables', stdout=io.StringIO())
+        self.assertEqual(estimate_row_count(Order), 40)
+
+        # Пагинатор берет оценку из статистики, пока ее не обновят
+        Order.objects.filter(order_number__lt=10).delete()
+        self.assertEqual(EstimatedCountPaginator(Order.objects.order_by('id'), 20).count, 40)
+        # Для отфильтрованной выборки - точный COUNT(*)
+        self.assertEqual(EstimatedCountPaginator(Order.objects.filter(code=901).order_by('id'), 20).count, 30)
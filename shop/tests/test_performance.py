@@ -0,0 +1,274 @@
+"""Бюджеты SQL-запросов и времени отрисовки для всех представлений shop
+
+Для каждой роли и каждого URL из shop/urls.py проверяется точное число
+SQL-запросов на «прогретом» процессе (кеши справочников и индексов уже
+загружены) и потолок времени ответа. Отдельно проверяется, что число
+запросов списков не растет при увеличении данных в 10 раз - это и есть
+доказательство отсутствия N+1.
+"""
+import time
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from shop.models import (
+    Category, Manufacturer, Supplier, Product, UserProfile,
+    DeliveryPoint, Order, OrderItem
+)
+from shop.pagecache import _cache_key
+from shop.recommendations import build_co_occurrence
+from shop.totals import fill_missing_snapshots, update_order_totals
+
+
+ROLES = ('anonymous', 'guest', 'client', 'manager', 'admin')
+
+# Потолок времени ответа на засеянных данных, секунды
+RENDER_CEILING = 1.0
+
+# Ожидаемое число SQL-запросов: представление -> {роль: запросов}
+QUERY_BUDGETS = {
+    'login': {'anonymous': 0, 'guest': 0, 'client': 0, 'manager': 0, 'admin': 0},
+    'products_guest': {'anonymous': 0, 'guest': 3, 'client': 3, 'manager': 3, 'admin': 3},
+    'dashboard': {'anonymous': 0, 'guest': 2, 'client': 2, 'manager': 2, 'admin': 2},
+    'products_list': {'anonymous': 0, 'guest': 3, 'client': 3, 'manager': 3, 'admin': 3},
+    'add_product': {'anonymous': 0, 'guest': 2, 'client': 2, 'manager': 2, 'admin': 2},
+    'edit_product': {'anonymous': 0, 'guest': 2, 'client': 2, 'manager': 2, 'admin': 3},
+    'delete_product': {'anonymous': 0, 'guest': 2, 'client': 2, 'manager': 2, 'admin': 5},
+    'orders_list': {'anonymous': 0, 'guest': 2, 'client': 2, 'manager': 5, 'admin': 5},
+    'add_order': {'anonymous': 0, 'guest': 2, 'client': 2, 'manager': 2, 'admin': 2},
+    'edit_order': {'anonymous': 0, 'guest': 2, 'client': 2, 'manager': 2, 'admin': 6},
+    'delete_order': {'anonymous': 0, 'guest': 2, 'client': 2, 'manager': 2, 'admin': 3},
+    'replenishment': {'anonymous': 0, 'guest': 2, 'client': 2, 'manager': 2, 'admin': 2},
+    'lookup': {'anonymous': 0, 'guest': 2, 'client': 2, 'manager': 2, 'admin': 2},
+    'delivery_points_nearest': {'anonymous': 0, 'guest': 3, 'client': 3, 'manager': 3, 'admin': 3},
+}
+
+# JSON-ответы, которые отказывают в доступе кодом 403, а не перенаправлением
+FORBIDDEN = {('lookup', role) for role in ('guest', 'client', 'manager')}
+
+# Списки, число запросов которых не должно зависеть от объема данных
+LIST_VIEWS = (
+    ('products_guest', 'anonymous'),
+    ('products_list', 'guest'),
+    ('products_list', 'client'),
+    ('products_list', 'manager'),
+    ('products_list', 'admin'),
+    ('orders_list', 'manager'),
+    ('orders_list', 'admin'),
+    ('edit_order', 'admin'),
+    ('replenishment', 'manager'),
+    ('lookup', 'admin'),
+)
+
+
+def seed(products=30, orders=30, items_per_order=3, offset=0):
+    """Засеять каталог и заказы; offset позволяет досеивать данные"""
+    categories = [Category.objects.get_or_create(name=name)[0] for name in ('Женская обувь', 'Мужская обувь')]
+    manufacturers = [Manufacturer.objects.get_or_create(name=name)[0] for name in ('Kari', 'Marco Tozzi', 'Rieker')]
+    suppliers = [Supplier.objects.get_or_create(name=name)[0] for name in ('Kari', 'Обувь для вас')]
+
+    Product.objects.bulk_create([
+        Product(
+            article=f'A{offset + i:06d}',
+            name=f'Ботинки {offset + i}',
+            price=Decimal('1000') + i,
+            supplier=suppliers[i % len(suppliers)],
+            manufacturer=manufacturers[i % len(manufacturers)],
+            category=categories[i % len(categories)],
+            discount=Decimal(i % 25),
+            quantity=i % 7,
+            description='Демисезонные ботинки',
+        )
+        for i in range(products)
+    ])
+    points = DeliveryPoint.objects.bulk_create([
+        DeliveryPoint(
+            address=f'{420000 + offset + i}, г. Лесной, ул. Вишневая, {i}',
+            postcode=str(420000 + offset + i),
+            latitude=55.0 + i / 100,
+            longitude=49.0 + i / 100,
+        )
+        for i in range(max(products // 3, 1))
+    ])
+
+    now = timezone.now()
+    statuses = ('pending', 'completed', 'cancelled')
+    created = Order.objects.bulk_create([
+        Order(
+            order_number=100000 + offset + i,
+            order_date=now - timedelta(days=i % 60),
+            delivery_date=now + timedelta(days=3),
+            delivery_point=points[i % len(points)],
+            customer_name=f'Клиент {i}',
+            code=900 + i,
+            status=statuses[i % len(statuses)],
+        )
+        for i in range(orders)
+    ])
+    OrderItem.objects.bulk_create([
+        OrderItem(
+            order=order,
+            product_id=f'A{offset + (i + j) % products:06d}',
+            quantity=1 + j,
+        )
+        for i, order in enumerate(created)
+        for j in range(items_per_order)
+    ])
+    # bulk_create обходит сигналы: снимки цен и итоги заказов считаем отдельно
+    order_ids = [order.id for order in created]
+    fill_missing_snapshots(order_ids)
+    update_order_totals(order_ids)
+    build_co_occurrence()
+
+
+def create_users():
+    users = {}
+    for role in ROLES[1:]:
+        user = User.objects.create_user(username=f'{role}@example.com', password='secret-password')
+        UserProfile.objects.create(user=user, role=role, full_name=f'Пользователь {role}')
+        users[role] = user
+    return users
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class PerformanceTestCase(TestCase):
+    """Общие данные и помощники для проверок производительности"""
+
+    @classmethod
+    def setUpTestData(cls):
+        seed()
+        cls.users = create_users()
+        cls.free_product = Product.objects.create(
+            article='FREE01', name='Туфли', price=Decimal('2000'),
+            supplier=Supplier.objects.first(), manufacturer=Manufacturer.objects.first(),
+            category=Category.objects.first(), quantity=5,
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def url(self, name):
+        order = Order.objects.order_by('id').first()
+        args = {
+            'edit_product': [Product.objects.order_by('article').first().article],
+            'delete_product': [self.free_product.article],
+            'edit_order': [order.id],
+            'delete_order': [order.id],
+            'lookup': ['supplier'],
+        }.get(name, [])
+        query = {
+            'lookup': '?q=ka',
+            'delivery_points_nearest': '?postcode=420001',
+        }.get(name, '')
+        return reverse(f'shop:{name}', args=args) + query
+
+    def login(self, role):
+        self.client.logout()
+        if role != 'anonymous':
+            self.client.force_login(self.users[role])
+
+    def get(self, name, role):
+        """Прогреть процесс одним запросом и вернуть (число SQL, время, ответ)"""
+        self.login(role)
+        url = self.url(name)
+        self.client.get(url)
+        with CaptureQueriesContext(connection) as queries:
+            started = time.perf_counter()
+            response = self.client.get(url)
+            elapsed = time.perf_counter() - started
+        if (name, role) in FORBIDDEN:
+            self.assertEqual(response.status_code, 403, f'{name} ({role})')
+        else:
+            self.assertLess(response.status_code, 400, f'{name} ({role}): {response.status_code}')
+        return len(queries), elapsed, response
+
+
+class QueryBudgetTests(PerformanceTestCase):
+
+    def test_query_budgets(self):
+        for name, budgets in QUERY_BUDGETS.items():
+            for role, budget in budgets.items():
+                with self.subTest(view=name, role=role):
+                    self.login(role)
+                    url = self.url(name)
+                    self.client.get(url)
+                    with self.assertNumQueries(budget):
+                        self.client.get(url)
+
+    def test_render_time_ceilings(self):
+        for name, budgets in QUERY_BUDGETS.items():
+            for role in budgets:
+                with self.subTest(view=name, role=role):
+                    _, elapsed, _ = self.get(name, role)
+                    self.assertLess(elapsed, RENDER_CEILING)
+
+    def test_every_url_has_a_budget(self):
+        from shop.urls import urlpatterns
+        names = {pattern.name for pattern in urlpatterns} - {'logout'}
+        self.assertEqual(names, set(QUERY_BUDGETS))
+
+    def test_logout(self):
+        self.login('admin')
+        # Пользователь и удаление сессии (с точками сохранения), сессия - из кеша
+        with self.assertNumQueries(3):
+            response = self.client.get(reverse('shop:logout'))
+        self.assertRedirects(response, reverse('shop:login'))
+
+    def test_login_post(self):
+        # Вход: пользователь, last_login и запись новой сессии (с точками сохранения)
+        with self.assertNumQueries(9):
+            response = self.client.post(reverse('shop:login'), {
+                'username': 'admin@example.com', 'password': 'secret-password',
+            })
+        self.assertRedirects(response, reverse('shop:dashboard'))
+
+    def test_guest_catalogue_is_served_from_page_cache(self):
+        self.login('anonymous')
+        self.client.get(reverse('shop:products_guest'))
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse('shop:products_guest'))
+        self.assertIn('ETag', response)
+
+    def test_undeclared_query_params_share_the_cached_page(self):
+        self.login('anonymous')
+        self.client.get(reverse('shop:products_guest'))
+        # Новые параметры не строят новых страниц: ответ из той же записи кеша
+        with self.assertNumQueries(0):
+            for i in range(3):
+                self.client.get(reverse('shop:products_guest'), {'utm': i})
+
+
+class ScalingTests(PerformanceTestCase):
+    """Число запросов списков не меняется при росте данных и размера заказов в 10 раз"""
+
+    def counts(self):
+        result = {}
+        for name, role in LIST_VIEWS:
+            # Кеш страниц и отчетов сбрасываем, чтобы списки строились заново
+            cache.clear()
+            url = self.url(name)
+            self.login(role)
+            self.client.get(url)
+            # Готовую страницу гостевого каталога убираем, чтобы считать запросы ее построения
+            cache.delete(_cache_key('guest_catalogue', ''))
+            with CaptureQueriesContext(connection) as queries:
+                self.client.get(url + ('?refresh=1' if name == 'replenishment' else ''))
+            result[(name, role)] = len(queries)
+        return result
+
+    def test_query_counts_constant_as_data_grows(self):
+        before = self.counts()
+        seed(products=270, orders=270, items_per_order=30, offset=1000)
+        after = self.counts()
+        # Гостевой каталог измеряется при построении, а не из кеша страниц
+        self.assertGreater(before[('products_guest', 'anonymous')], 0)
+        for key in before:
+            with self.subTest(view=key[0], role=key[1]):
+                self.assertEqual(before[key], after[key])
@@ -0,0 +1,81 @@
+"""Команда ingest_photos: сопоставление, варианты, пропуск неизмененных"""
+import io
+import multiprocessing
+import shutil
+import tempfile
+from decimal import Decimal
+from pathlib import Path
+
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from PIL import Image
+
+from shop.models import Category, Manufacturer, Supplier, Product
+
+
+RENDITIONS = {
+    'photo': {'size': (300, 200), 'format': 'JPEG', 'quality': 85, 'dir': 'products'},
+    'webp': {'size': (120, 80), 'format': 'WEBP', 'quality': 80, 'dir': 'products/webp'},
+}
+
+
+class IngestPhotosTests(TestCase):
+
+    def setUp(self):
+        self.media = Path(tempfile.mkdtemp())
+        self.source = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.media)
+        self.addCleanup(shutil.rmtree, self.source)
+        self.settings_override = override_settings(MEDIA_ROOT=self.media, SHOP_PHOTO_RENDITIONS=RENDITIONS)
+        self.settings_override.enable()
+        self.addCleanup(self.settings_override.disable)
+
+        references = {
+            'supplier': Supplier.objects.create(name='Kari'),
+            'manufacturer': Manufacturer.objects.create(name='Kari'),
+            'category': Category.objects.create(name='Женская обувь'),
+        }
+        self.by_photo = Product.objects.create(
+            article='A112T4', name='Ботинки', price=Decimal('4990'), photo='products/1.jpg', **references
+        )
+        self.by_article = Product.objects.create(
+            article='F635R4', name='Ботинки', price=Decimal('3244'), **references
+        )
+        self.write_image('1.jpg', 'red')
+        self.write_image('F635R4.png', 'blue')
+        self.write_image('Icon.png', 'green')
+
+    def write_image(self, name, color):
+        Image.new('RGB', (500, 500), color).save(self.source / name)
+
+    def ingest(self, *args, workers=1):
+        output = io.StringIO()
+        call_command('ingest_photos', '--source', str(self.source), '--workers', str(workers), *args, stdout=output)
+        return output.getvalue()
+
+    def test_process_pool(self):
+        if multiprocessing.current_process().daemon:
+            self.skipTest('процесс --parallel не может запускать дочерние процессы')
+        output = self.ingest(workers=2)
+        self.assertIn('Обработано: 2', output)
+        self.assertIn('процессов: 2', output)
+
+    def test_photos_are_matched_and_rendered(self):
+        output = self.ingest()
+
+        self.assertIn('Обработано: 2', output)
+        self.assertIn('Icon.png', output)
+        self.by_article.refresh_from_db()
+        self.assertEqual(self.by_article.photo.name, 'products/F635R4.jpg')
+        with Image.open(self.media / 'products' / '1.jpg') as image:
+            self.assertEqual(image.size, (200, 200))
+        with Image.open(self.media / 'products' / 'webp' / 'F635R4.webp') as image:
+            self.assertEqual(image.size, (80, 80))
+
+    def test_unchanged_photos_are_skipped(self):
+        self.ingest()
+        self.assertIn('Обработано: 0, без изменений: 2', self.ingest())
+
+        self.write_image('1.jpg', 'black')
+        self.assertIn('Обработано: 1, без изменений: 1', self.ingest())
+        self.assertIn('Обработано: 2', self.ingest('--force'))
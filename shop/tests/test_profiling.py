@@ -0,0 +1,84 @@
+"""Выборочное профилирование запросов и отчет по профилям"""
+import shutil
+import tempfile
+from pathlib import Path
+from unittest import mock
+
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+
+from shop import profiling
+from shop.management.commands.profile_report import normalize_sql
+from shop.models import Category
+from shop.profiling import ProfilingMiddleware, _rotate
+
+
+def view(request):
+    return HttpResponse(str(Category.objects.count()))
+
+
+class ProfilingMiddlewareTests(TestCase):
+
+    def setUp(self):
+        self.directory = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.directory)
+        config = {'ENABLED': True, 'SAMPLE_RATE': 1, 'DIR': self.directory, 'MAX_FILES_PER_VIEW': 2}
+        with override_settings(SHOP_PROFILING=config):
+            self.middleware = ProfilingMiddleware(view)
+        self.request = RequestFactory().get('/catalog/')
+
+    def saved(self):
+        return sorted(path.name.split('.', 2)[-1] for path in self.directory.rglob('*.*'))
+
+    def test_saves_profile_and_queries(self):
+        response = self.middleware(self.request)
+
+        self.assertEqual(response.content, b'0')
+        self.assertEqual(self.saved(), ['prof', 'sql.json'])
+        queries = next(self.directory.rglob('*.sql.json')).read_text(encoding='utf-8')
+        self.assertIn('shop_category', queries)
+
+    def test_busy_profiler_serves_request_unprofiled(self):
+        with profiling._profiler_lock:
+            response = self.middleware(self.request)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.saved(), [])
+
+    def test_profiler_taken_by_another_tool(self):
+        with mock.patch('cProfile.Profile.enable', side_effect=ValueError('Another profiling tool is already active')):
+            response = self.middleware(self.request)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.saved(), [])
+
+    def test_write_errors_are_logged(self):
+        with mock.patch.object(ProfilingMiddleware, 'dump', side_effect=OSError('No space left on device')), \
+                self.assertLogs('shop.profiling', level='ERROR'):
+            response = self.middleware(self.request)
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(profiling._profiler_lock.locked())
+
+
+class ProfileFilesTests(SimpleTestCase):
+
+    def test_rotate_keeps_newest_profiles(self):
+        directory = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, directory)
+        for name in ('1.000000-1', '2.000000-1', '3.000000-1'):
+            (directory / f'{name}.prof').touch()
+            (directory / f'{name}.sql.json').touch()
+
+        _rotate(directory, keep=2)
+
+        self.assertEqual(
+            sorted(path.name for path in directory.iterdir()),
+            ['2.000000-1.prof', '2.000000-1.sql.json', '3.000000-1.prof', '3.000000-1.sql.json'],
+        )
+
+    def test_normalize_sql(self):
+        sql = ('SELECT "shop_product"."name" FROM "shop_product"\n'
+               'WHERE "shop_product"."price" > 10.5 AND "name" = \'O\'\'Brien\' AND "id" IN (1, 2, 3) LIMIT 21')
+        self.assertEqual(
+            normalize_sql(sql),
+            'SELECT "shop_product"."name" FROM "shop_product" '
+            'WHERE "shop_product"."price" > ? AND "name" = ? AND "id" IN (...) LIMIT ?',
+        )
@@ -0,0 +1,119 @@
+"""Рекомендации «Часто покупают вместе»"""
+import itertools
+from collections import Counter
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock
+
+from django.core.cache import cache
+from django.template import Context, Template
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+
+from shop import recommendations
+from shop.models import Category, Manufacturer, Supplier, Product, Order, OrderItem, ProductCoOccurrence
+from shop.recommendations import (
+    RelatedProductsIndex, build_co_occurrence, co_occurrence_pairs,
+    get_related_index, related_products, related_to_order,
+)
+
+
+class CoOccurrencePairsTests(SimpleTestCase):
+
+    def test_matches_naive_count(self):
+        orders = {1: ['A', 'B', 'C'], 2: ['A', 'B'], 3: ['C'], 4: ['B', 'C', 'D']}
+        order_ids = [order for order, items in orders.items() for _ in items]
+        product_ids = [item for items in orders.values() for item in items]
+
+        articles, rows, cols, counts = co_occurrence_pairs(order_ids, product_ids)
+        pairs = {(articles[r], articles[c]): n for r, c, n in zip(rows, cols, counts)}
+
+        expected = Counter(
+            pair for items in orders.values() for pair in itertools.permutations(items, 2)
+        )
+        self.assertEqual(pairs, dict(expected))
+
+    def test_empty_history(self):
+        articles, rows, cols, counts = co_occurrence_pairs([], [])
+        self.assertEqual((len(articles), len(counts)), (0, 0))
+
+    def test_index_keeps_top_k_in_order(self):
+        rows = [('A', 'B'), ('A', 'C'), ('A', 'D'), ('B', 'A')]
+        index = RelatedProductsIndex(rows, top_k=2)
+        self.assertEqual(index.related('A'), ['B', 'C'])
+        self.assertEqual(index.related('A', k=1), ['B'])
+        self.assertEqual(index.related('Z'), [])
+        self.assertEqual(index.related_to_many(['A', 'B']), ['C'])
+
+
+class RecommendationsTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        references = {
+            'supplier': Supplier.objects.create(name='Kari'),
+            'manufacturer': Manufacturer.objects.create(name='Kari'),
+            'category': Category.objects.create(name='Женская обувь'),
+        }
+        for article in ('A', 'B', 'C'):
+            Product.objects.create(article=article, name=article, price=Decimal('1000'), **references)
+
+    def setUp(self):
+        cache.clear()
+        recommendations._index = None
+
+    def place(self, number, articles):
+        now = timezone.now()
+        order = Order.objects.create(
+            order_number=number, order_date=now, delivery_date=now + timedelta(days=3),
+            customer_name='Клиент', code=901,
+        )
+        for article in articles:
+            OrderItem.objects.create(order=order, product_id=article)
+        return order
+
+    def test_build_and_incremental_update_agree(self):
+        self.place(1, ['A', 'B'])
+        self.place(2, ['A', 'B', 'C'])
+        incremental = set(ProductCoOccurrence.objects.values_list('product_id', 'related_id', 'count'))
+
+        build_co_occurrence()
+        rebuilt = set(ProductCoOccurrence.objects.values_list('product_id', 'related_id', 'count'))
+        self.assertEqual(incremental, rebuilt)
+        self.assertEqual(related_products('A'), ['B', 'C'])
+        self.assertEqual(related_to_order(['C']), ['A', 'B'])
+
+    def test_pair_created_concurrently_is_incremented(self):
+        order = self.place(1, ['A'])
+        # Ту же первую пару только что записал параллельный заказ
+        ProductCoOccurrence.objects.create(product_id='A', related_id='B', count=1)
+        ProductCoOccurrence.objects.create(product_id='B', related_id='A', count=1)
+
+        OrderItem.objects.create(order=order, product_id='B')
+
+        self.assertEqual(
+            sorted(ProductCoOccurrence.objects.values_list('product_id', 'related_id', 'count')),
+            [('A', 'B', 2), ('B', 'A', 2)],
+        )
+
+    @override_settings(SHOP_RECOMMENDATIONS_REFRESH_SECONDS=300)
+    def test_new_orders_do_not_reload_index_within_interval(self):
+        self.place(1, ['A', 'B'])
+        build_co_occurrence()
+        index = get_related_index()
+
+        self.place(2, ['A', 'C'])
+        self.assertIs(get_related_index(), index)
+
+        # По истечении интервала изменения подхватываются
+        with mock.patch('shop.recommendations.time.monotonic', return_value=recommendations._index_version[2] + 301):
+            self.assertEqual(get_related_index().related('C'), ['A'])
+
+    def test_template_tag_resolves_index_once_per_render(self):
+        build_co_occurrence()
+        template = Template(
+            '{% load shop_extras %}{% for a in articles %}{% related_products a 3 as related %}{{ related|join:"," }};{% endfor %}'
+        )
+        with mock.patch('shop.templatetags.shop_extras.get_related_index', wraps=get_related_index) as resolve:
+            template.render(Context({'articles': ['A', 'B', 'C']}))
+        self.assertEqual(resolve.call_count, 1)
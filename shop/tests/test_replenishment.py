@@ -0,0 +1,67 @@
+"""Отчет о пополнении склада"""
+from datetime import timedelta
+from decimal import Decimal
+
+import numpy as np
+from django.test import SimpleTestCase, TestCase
+from django.utils import timezone
+
+from shop.models import Category, Manufacturer, Supplier, Product, Order, OrderItem
+from shop.replenishment import compute_replenishment, sales_by_window
+
+
+class SalesByWindowTests(SimpleTestCase):
+
+    def test_counts_sales_inside_each_window(self):
+        product_idx = np.array([0, 0, 1, 1])
+        quantities = np.array([1.0, 2.0, 5.0, 1.0])
+        ages = np.array([1.0, 20.0, 3.0, 60.0])
+        sold = sales_by_window(product_idx, quantities, ages, (7, 30, 90), 3)
+        np.testing.assert_array_equal(sold, [[1, 5, 0], [3, 5, 0], [3, 6, 0]])
+
+
+class ComputeReplenishmentTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        kari, other = Supplier.objects.create(name='Kari'), Supplier.objects.create(name='Обувь для вас')
+        references = {
+            'manufacturer': Manufacturer.objects.create(name='Kari'),
+            'category': Category.objects.create(name='Женская обувь'),
+        }
+        Product.objects.create(article='FAST', name='Ботинки', price=Decimal('1000'), quantity=10,
+                               supplier=kari, **references)
+        Product.objects.create(article='SLOW', name='Туфли', price=Decimal('1000'), quantity=100,
+                               supplier=other, **references)
+        Product.objects.create(article='IDLE', name='Сапоги', price=Decimal('1000'), quantity=0,
+                               supplier=other, **references)
+
+        cls.now = timezone.now()
+        sales = [(5, 'FAST', 30, 'completed'), (20, 'FAST', 30, 'completed'),
+                 (10, 'SLOW', 3, 'completed'), (2, 'FAST', 500, 'cancelled'), (200, 'FAST', 500, 'completed')]
+        for number, (days_ago, article, quantity, status) in enumerate(sales):
+            order = Order.objects.create(
+                order_number=number, order_date=cls.now - timedelta(days=days_ago),
+                delivery_date=cls.now, customer_name='Клиент', code=901, status=status,
+            )
+            OrderItem.objects.create(order=order, product_id=article, quantity=quantity)
+
+    def test_forecast_and_grouping(self):
+        report = compute_replenishment(
+            now=self.now, windows=(7, 30, 90), velocity_window=30, lead_time_days=14, cover_days=30,
+        )
+
+        self.assertEqual(report['products_count'], 3)
+        self.assertEqual([s['name'] for s in report['suppliers']], ['Kari'])
+        row, = report['suppliers'][0]['products']
+        self.assertEqual(row['article'], 'FAST')
+        # Отмененный заказ и продажа за пределами окон не учитываются
+        self.assertEqual(row['velocities'], [round(30 / 7, 3), 2.0, round(60 / 90, 3)])
+        self.assertEqual(row['days_until_stockout'], 5.0)
+        self.assertEqual(row['reorder_quantity'], 2 * 44 - 10)
+        self.assertEqual(report['suppliers'][0]['total_reorder_quantity'], 78)
+
+    def test_no_sales(self):
+        OrderItem.objects.all().delete()
+        report = compute_replenishment(now=self.now)
+        self.assertEqual(report['suppliers'], [])
@@ -0,0 +1,114 @@
+"""Снимок цен в позициях и сохраненные итоги заказов"""
+import io
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from shop.models import Category, Manufacturer, Supplier, Product, UserProfile, Order, OrderItem
+from shop.totals import order_totals
+
+
+class OrderTotalsTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        references = {
+            'supplier': Supplier.objects.create(name='Kari'),
+            'manufacturer': Manufacturer.objects.create(name='Kari'),
+            'category': Category.objects.create(name='Женская обувь'),
+        }
+        cls.boots = Product.objects.create(
+            article='A112T4', name='Ботинки', price=Decimal('4990'), discount=Decimal('3'), **references
+        )
+        cls.shoes = Product.objects.create(
+            article='F635R4', name='Туфли', price=Decimal('3244'), **references
+        )
+
+    def create_order(self, number):
+        now = timezone.now()
+        return Order.objects.create(
+            order_number=number, order_date=now, delivery_date=now + timedelta(days=3),
+            customer_name='Клиент', code=901,
+        )
+
+    def test_item_keeps_price_snapshot(self):
+        order = self.create_order(1)
+        item = OrderItem.objects.create(order=order, product=self.boots, quantity=2)
+
+        self.assertEqual(item.unit_price, Decimal('4990'))
+        self.assertEqual(item.line_total, Decimal('9680.60'))
+
+        Product.objects.filter(pk=self.boots.pk).update(price=Decimal('9999'))
+        item = OrderItem.objects.get(pk=item.pk)
+        item.quantity = 3
+        item.save()
+        self.assertEqual(item.unit_price, Decimal('4990'))
+        self.assertEqual(item.line_total, Decimal('14520.90'))
+
+        # При замене товара снимок берется заново
+        item.product = self.shoes
+        item.save()
+        self.assertEqual((item.unit_price, item.discount), (Decimal('3244'), Decimal('0')))
+
+    def test_order_totals_are_stored(self):
+        order = self.create_order(2)
+        OrderItem.objects.create(order=order, product=self.boots, quantity=2)
+        OrderItem.objects.create(order=order, product=self.shoes, quantity=1)
+
+        order.refresh_from_db()
+        self.assertEqual(order.total_items, 2)
+        self.assertEqual(order.total_units, 3)
+        self.assertEqual(order.total_gross, Decimal('13224.00'))
+        self.assertEqual(order.total_discount, Decimal('299.40'))
+        self.assertEqual(order.total_net, Decimal('12924.60'))
+
+        # Удаление набора позиций тоже пересчитывает итоги
+        order.items.filter(product=self.shoes).delete()
+        order.refresh_from_db()
+        self.assertEqual((order.total_items, order.total_net), (1, Decimal('9680.60')))
+
+        # Удаление заказа удаляет позиции каскадом без пересчета
+        with self.assertNumQueries(3):
+            order.delete()
+
+    def test_recalc_command_fixes_bulk_created_items(self):
+        order = self.create_order(3)
+        OrderItem.objects.bulk_create([OrderItem(order=order, product=self.boots, quantity=2)])
+        order.refresh_from_db()
+        self.assertEqual(order.total_net, Decimal('0'))
+
+        call_command('recalc_order_totals', stdout=io.StringIO())
+
+        item = order.items.get()
+        self.assertEqual((item.unit_price, item.line_total), (Decimal('4990'), Decimal('9680.60')))
+        order.refresh_from_db()
+        self.assertEqual((order.total_units, order.total_net), (2, Decimal('9680.60')))
+
+    def test_totals_for_many_orders_in_one_query(self):
+        orders = [self.create_order(10 + i) for i in range(5)]
+        for order in orders:
+            OrderItem.objects.create(order=order, product=self.shoes, quantity=2)
+
+        with self.assertNumQueries(1):
+            totals = order_totals([order.pk for order in orders])
+        self.assertEqual({row['total_net'] for row in totals.values()}, {Decimal('6488.00')})
+
+    def test_orders_list_filters_by_total(self):
+        user = User.objects.create_user(username='manager@example.com', password='secret-password')
+        UserProfile.objects.create(user=user, role='manager', full_name='Менеджер')
+        self.client.force_login(user)
+        for number, quantity in ((20, 1), (21, 2), (22, 5)):
+            OrderItem.objects.create(order=self.create_order(number), product=self.shoes, quantity=quantity)
+
+        def listed(**params):
+            response = self.client.get(reverse('shop:orders_list'), params)
+            return sorted(order.order_number for order in response.context['orders'])
+
+        self.assertEqual(listed(min_total='6488'), [21, 22])
+        self.assertEqual(listed(min_total='5000', max_total='10000,50'), [21])
+        self.assertEqual(listed(max_total='abc'), [20, 21, 22])
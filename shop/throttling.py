@@ -0,0 +1,72 @@
+"""Ограничение попыток входа
+
+Неудачные попытки считаются отдельно по IP-адресу и по логину в окне
+SHOP_LOGIN_THROTTLE['WINDOW'] секунд. Счетчики хранятся в общем кеше
+SHOP_LOGIN_THROTTLE['CACHE'], отдельном от кеша страниц: записи страниц
+не должны вытеснять счетчики и обнулять лимит. Когда счетчик
+достигает лимита, вход отклоняется до проверки пароля, поэтому перебор
+не тратит время процессора на хеширование и запросы к БД.
+"""
+import hashlib
+
+from django.conf import settings
+from django.core.cache import caches
+
+
+KEY_PREFIX = 'shop:login:'
+
+DEFAULTS = {
+    'IP_LIMIT': 20,
+    'USERNAME_LIMIT': 5,
+    'WINDOW': 300,
+    'CACHE': 'default',
+}
+
+
+def throttle_settings():
+    config = dict(DEFAULTS)
+    config.update(getattr(settings, 'SHOP_LOGIN_THROTTLE', {}))
+    return config
+
+
+def throttle_cache():
+    return caches[throttle_settings()['CACHE']]
+
+
+def client_ip(request):
+    return request.META.get('REMOTE_ADDR') or 'unknown'
+
+
+def _keys(request, username):
+    config = throttle_settings()
+    # Логин хешируется: в ключе кеша не должно быть произвольных символов
+    username = hashlib.md5((username or '').strip().lower().encode()).hexdigest()
+    return (
+        (KEY_PREFIX + 'ip:' + client_ip(request), config['IP_LIMIT']),
+        (KEY_PREFIX + 'user:' + username, config['USERNAME_LIMIT']),
+    )
+
+
+def is_blocked(request, username):
+    """Превышен ли лимит неудачных попыток для IP-адреса или логина"""
+    keys = _keys(request, username)
+    counters = throttle_cache().get_many([key for key, limit in keys])
+    return any(counters.get(key, 0) >= limit for key, limit in keys)
+
+
+def register_failure(request, username):
+    """Учесть неудачную попытку входа"""
+    window = throttle_settings()['WINDOW']
+    cache = throttle_cache()
+    for key, limit in _keys(request, username):
+        # Окно отсчитывается от первой неудачной попытки
+        if not cache.add(key, 1, window):
+            try:
+                cache.incr(key)
+            except ValueError:
+                cache.add(key, 1, window)
+
+
+def reset(request, username):
+    """Сбросить счетчик логина после успешного входа"""
+    throttle_cache().delete(_keys(request, username)[1][0])
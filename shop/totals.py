@@ -0,0 +1,102 @@
+"""Итоги заказов
+
+При добавлении позиции в заказ в OrderItem сохраняется снимок цены и
+скидки товара и сумма строки (см. OrderItem.take_snapshot), поэтому
+последующее изменение цены товара не меняет уже оформленные заказы. Итоги
+заказа (позиций, единиц, сумма без скидки, скидка, к оплате) хранятся в
+Order: списки заказов выводят и сортируют их без обращения к позициям.
+Итоги для любого набора заказов считаются одним агрегирующим запросом.
+
+Итоги пересчитываются сигналами при сохранении и удалении позиций (в том
+числе удалении набора позиций QuerySet.delete). Групповые операции без
+сигналов (bulk_create, QuerySet.update) итоги и снимки цен не обновляют:
+после них нужно запустить команду recalc_order_totals.
+"""
+from decimal import Decimal
+
+from django.db.models import Count, DecimalField, ExpressionWrapper, F, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce, Round
+
+from .models import Order, OrderItem, Product
+
+
+CENT = Decimal('0.01')
+
+TOTAL_FIELDS = ('total_items', 'total_units', 'total_gross', 'total_discount', 'total_net')
+
+EMPTY_TOTALS = {
+    'total_items': 0,
+    'total_units': 0,
+    'total_gross': Decimal('0'),
+    'total_discount': Decimal('0'),
+    'total_net': Decimal('0'),
+}
+
+
+def totals_aggregates():
+    """Агрегаты итогов по позициям (для values('order_id').annotate)"""
+    money = DecimalField(max_digits=12, decimal_places=2)
+    gross = ExpressionWrapper(F('unit_price') * F('quantity'), output_field=money)
+    zero = Value(Decimal('0'), output_field=money)
+    return {
+        'total_items': Count('id'),
+        'total_units': Coalesce(Sum('quantity'), 0),
+        'total_gross': Coalesce(Sum(gross), zero),
+        'total_net': Coalesce(Sum('line_total'), zero),
+    }
+
+
+def order_totals(order_ids):
+    """Итоги заказов одним запросом: {id заказа: {поле: значение}}"""
+    rows = (
+        OrderItem.objects.filter(order_id__in=order_ids)
+        .order_by()
+        .values('order_id')
+        .annotate(**totals_aggregates())
+    )
+    totals = {}
+    for row in rows:
+        order_id = row.pop('order_id')
+        # SQLite возвращает суммы без округления до копеек
+        row['total_gross'] = Decimal(row['total_gross']).quantize(CENT)
+        row['total_net'] = Decimal(row['total_net']).quantize(CENT)
+        row['total_discount'] = row['total_gross'] - row['total_net']
+        totals[order_id] = row
+    return totals
+
+
+def fill_missing_snapshots(order_ids=None):
+    """Снять цены для позиций без снимка (созданных bulk_create), вернуть число позиций
+
+    Снимок и сумма строки считаются в БД групповыми UPDATE по тем же правилам,
+    что и OrderItem.take_snapshot.
+    """
+    items = OrderItem.objects.filter(unit_price__isnull=True)
+    if order_ids is not None:
+        items = items.filter(order_id__in=order_ids)
+    money = DecimalField(max_digits=12, decimal_places=2)
+    product = Product.objects.filter(article=OuterRef('product_id'))
+    price = Subquery(product.values('price')[:1], output_field=money)
+    # 100.0, а не 100: иначе SQLite делит нацело
+    discount = ExpressionWrapper(price * Subquery(product.values('discount')[:1]) / Value(100.0), output_field=money)
+    line_total = ExpressionWrapper(Round(price - discount, 2) * F('quantity'), output_field=money)
+    # Сначала сумма строки: пока unit_price пуст, выборка позиций та же
+    count = items.update(line_total=line_total)
+    items.update(
+        unit_price=Subquery(product.values('price')[:1]),
+        discount=Subquery(product.values('discount')[:1]),
+    )
+    return count
+
+
+def update_order_totals(order_ids):
+    """Пересчитать и сохранить итоги заказов"""
+    order_ids = list(order_ids)
+    if not order_ids:
+        return 0
+    totals = order_totals(order_ids)
+    orders = [
+        Order(id=order_id, **totals.get(order_id, EMPTY_TOTALS))
+        for order_id in order_ids
+    ]
+    return Order.objects.bulk_update(orders, TOTAL_FIELDS)
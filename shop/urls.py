@@ -12,8 +12,11 @@ urlpatterns = [
     path('products/<str:article>/edit/', views.edit_product, name='edit_product'),
     path('products/add/', views.add_product, name='add_product'),
     path('products/<str:article>/delete/', views.delete_product, name='delete_product'),
+    path('replenishment/', views.replenishment, name='replenishment'),
     path('orders/', views.orders_list, name='orders_list'),
     path('orders/<int:order_id>/edit/', views.edit_order, name='edit_order'),
     path('orders/add/', views.add_order, name='add_order'),
     path('orders/<int:order_id>/delete/', views.delete_order, name='delete_order'),
+    path('lookup/<str:name>/', views.lookup, name='lookup'),
+    path('delivery-points/nearest/', views.delivery_points_nearest, name='delivery_points_nearest'),
 ]
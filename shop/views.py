@@ -2,37 +2,117 @@ from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth import authenticate, login, logout
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.models import User
+from django.conf import settings
 from django.contrib import messages
 from django.http import JsonResponse
+from django.utils import timezone
 from django.db.models import Q
+from django.utils.dateparse import parse_date
 from .models import (
     Product, UserProfile, Order, OrderItem, DeliveryPoint,
-    Category, Manufacturer, Supplier
+    Category, Manufacturer, ArchivedOrderItem
 )
+from .archive import archived_orders_between, newest_archived_date
+from .cache import CATALOGUE_VERSION
+from .choices import get_provider
 from .forms import ProductForm, OrderForm
+from .geo import nearest_delivery_points
+from .pagecache import stale_while_revalidate
+from .recommendations import related_to_order, RECOMMENDATIONS_VERSION
+from .replenishment import get_replenishment_report
+from . import throttling
+from datetime import datetime, time, timedelta, timezone as dt_timezone
+from decimal import Decimal, InvalidOperation
 import json
 
 
+ORDER_SORTS = {
+    'date': '-order_date',
+    'total': '-total_net',
+}
+
+
+def _day_start(value, days=0):
+    """Начало дня из строки ГГГГ-ММ-ДД (со сдвигом на days дней) или None"""
+    try:
+        day = parse_date((value or '').strip())
+    except ValueError:
+        return None
+    if day is None:
+        return None
+    try:
+        start = timezone.make_aware(datetime.combine(day + timedelta(days=days), time.min))
+        # Крайние даты (0001-01-01, 9999-12-31) выходят за пределы datetime при сдвиге
+        # или переводе в UTC; такая граница ничего не отсекает
+        start.astimezone(dt_timezone.utc)
+    except OverflowError:
+        return None
+    return start
+
+
+def _amount(value):
+    """Сумма из строки (через точку или запятую) или None"""
+    try:
+        amount = Decimal((value or '').strip().replace(',', '.'))
+    except InvalidOperation:
+        return None
+    return amount if amount.is_finite() else None
+
+
+def _location_from_request(request):
+    """Место для поиска ближайших пунктов выдачи из GET-параметров"""
+    postcode = request.GET.get('postcode', '').strip()
+    latitude = request.GET.get('lat', '').strip()
+    longitude = request.GET.get('lon', '').strip()
+    if latitude and longitude:
+        try:
+            latitude, longitude = float(latitude), float(longitude)
+        except ValueError:
+            return None
+        # nan и inf не сравниваются с границами и тоже отбрасываются
+        if not (-90 <= latitude <= 90 and -180 <= longitude <= 180):
+            return None
+        return {'latitude': latitude, 'longitude': longitude}
+    if postcode:
+        return {'postcode': postcode}
+    return None
+
+
 def login_view(request):
     """Представление для входа пользователя"""
     if request.method == 'POST':
         username = request.POST.get('username')
         password = request.POST.get('password')
         
+        # Перебор паролей отклоняется до проверки пароля
+        if throttling.is_blocked(request, username):
+            messages.error(request, 'Слишком много попыток входа. Попробуйте позже')
+            return render(request, 'shop/login.html', status=429)
+        
         user = authenticate(request, username=username, password=password)
         
         if user is not None:
+            throttling.reset(request, username)
             login(request, user)
             return redirect('shop:dashboard')
         else:
+            throttling.register_failure(request, username)
             messages.error(request, 'Неверный логин или пароль')
     
     return render(request, 'shop/login.html')
 
 
+@stale_while_revalidate(
+    'guest_catalogue',
+    versions=(CATALOGUE_VERSION, RECOMMENDATIONS_VERSION),
+    max_age=getattr(settings, 'SHOP_GUEST_CATALOGUE_MAX_AGE', 60),
+    stale=getattr(settings, 'SHOP_GUEST_CATALOGUE_STALE', 600),
+)
 def products_list_guest(request):
     """Представление для просмотра товаров гостем (без фильтрации)"""
-    products = Product.objects.all().order_by('article')
+    products = Product.objects.select_related(
+        'category', 'manufacturer', 'supplier'
+    ).order_by('article')
     
     context = {
         'products': products,
@@ -68,11 +148,15 @@ def products_list(request):
     # Проверяем роль пользователя
     if profile.role == 'guest':
         # Гости видят все товары без фильтрации
-        products = Product.objects.all().order_by('article')
+        products = Product.objects.select_related(
+            'category', 'manufacturer', 'supplier'
+        ).order_by('article')
         has_filters = False
     elif profile.role == 'client':
         # Клиенты видят все товары без фильтрации
-        products = Product.objects.all().order_by('article')
+        products = Product.objects.select_related(
+            'category', 'manufacturer', 'supplier'
+        ).order_by('article')
         has_filters = False
     elif profile.role in ['manager', 'admin']:
         # Менеджер и администратор имеют доступ к фильтрации
@@ -107,8 +191,8 @@ def products_list(request):
         
         products = products.select_related('category', 'manufacturer', 'supplier')
     
-    # Получаем список поставщиков для фильтра
-    suppliers = Supplier.objects.all().order_by('name')
+    # Получаем список поставщиков для фильтра (из кеша справочника)
+    suppliers = [{'id': pk, 'name': name} for pk, name in get_provider('supplier').choices()]
     
     context = {
         'products': products,
@@ -201,8 +285,9 @@ def delete_product(request, article):
     
     product = get_object_or_404(Product, article=article)
     
-    # Проверяем, есть ли товар в заказах
-    if OrderItem.objects.filter(product=product).exists():
+    # Проверяем, есть ли товар в заказах (в том числе архивных)
+    if (OrderItem.objects.filter(product=product).exists()
+            or ArchivedOrderItem.objects.filter(product=product).exists()):
         messages.error(request, f'Товар "{product.name}" присутствует в заказах и не может быть удален')
         return redirect('shop:products_list')
     
@@ -232,16 +317,80 @@ def orders_list(request):
         messages.error(request, 'У вас нет доступа к этой странице')
         return redirect('shop:dashboard')
     
-    orders = Order.objects.all().order_by('-order_date')
+    # Сортировка по дате или по сохраненной сумме заказа (по индексу)
+    sort = request.GET.get('sort', 'date')
+    if sort not in ORDER_SORTS:
+        sort = 'date'
+    
+    orders = Order.objects.select_related('delivery_point').prefetch_related(
+        'items__product'
+    ).order_by(ORDER_SORTS[sort], '-order_date')
+    
+    # Фильтр по дате заказа
+    date_from = _day_start(request.GET.get('date_from'))
+    date_to = _day_start(request.GET.get('date_to'), days=1)
+    if date_from:
+        orders = orders.filter(order_date__gte=date_from)
+    if date_to:
+        orders = orders.filter(order_date__lt=date_to)
+    
+    # Фильтр по сохраненной сумме заказа (по индексу)
+    total_filter = {}
+    min_total = _amount(request.GET.get('min_total'))
+    max_total = _amount(request.GET.get('max_total'))
+    if min_total is not None:
+        total_filter['total_net__gte'] = min_total
+    if max_total is not None:
+        total_filter['total_net__lte'] = max_total
+    orders = orders.filter(**total_filter)
+    
+    # Старые заказы могут быть уже перенесены в архив - читаем и оттуда
+    newest_archived = newest_archived_date() if (date_from or date_to) else None
+    if newest_archived and (date_from is None or date_from <= newest_archived):
+        archived = list(archived_orders_between(date_from, date_to).filter(**total_filter))
+        if archived:
+            sort_field = ORDER_SORTS[sort].lstrip('-')
+            orders = sorted(
+                list(orders) + archived,
+                key=lambda order: (getattr(order, sort_field), order.order_date),
+                reverse=True,
+            )
     
     context = {
         'orders': orders,
         'profile': profile,
+        'date_from': request.GET.get('date_from', ''),
+        'date_to': request.GET.get('date_to', ''),
+        'min_total': request.GET.get('min_total', ''),
+        'max_total': request.GET.get('max_total', ''),
+        'sort': sort,
     }
     
     return render(request, 'shop/orders_list.html', context)
 
 
+@login_required(login_url='shop:login')
+def replenishment(request):
+    """Отчет о пополнении склада (для менеджера и администратора)"""
+    try:
+        profile = request.user.profile
+    except UserProfile.DoesNotExist:
+        return redirect('shop:login')
+    
+    if profile.role not in ['manager', 'admin']:
+        messages.error(request, 'У вас нет доступа к этой странице')
+        return redirect('shop:dashboard')
+    
+    report = get_replenishment_report(refresh=request.GET.get('refresh') == '1')
+    
+    context = {
+        'report': report,
+        'profile': profile,
+    }
+    
+    return render(request, 'shop/replenishment.html', context)
+
+
 @login_required(login_url='shop:login')
 def add_order(request):
     """Добавление нового заказа (только для администратора)"""
@@ -255,13 +404,13 @@ def add_order(request):
         return redirect('shop:orders_list')
     
     if request.method == 'POST':
-        form = OrderForm(request.POST)
+        form = OrderForm(request.POST, near=_location_from_request(request))
         if form.is_valid():
             order = form.save()
             messages.success(request, f'Заказ #{order.order_number} успешно добавлен')
             return redirect('shop:orders_list')
     else:
-        form = OrderForm()
+        form = OrderForm(near=_location_from_request(request))
     
     context = {
         'form': form,
@@ -284,22 +433,37 @@ def edit_order(request, order_id):
         messages.error(request, 'У вас нет доступа к этой странице')
         return redirect('shop:orders_list')
     
-    order = get_object_or_404(Order, id=order_id)
+    order = get_object_or_404(
+        Order.objects.select_related('delivery_point').prefetch_related('items__product'),
+        id=order_id,
+    )
+    
+    # По умолчанию сортируем пункты выдачи по близости к текущему пункту заказа
+    near = _location_from_request(request)
+    point = order.delivery_point
+    if near is None and point is not None and point.latitude is not None:
+        near = {'latitude': point.latitude, 'longitude': point.longitude}
     
     if request.method == 'POST':
-        form = OrderForm(request.POST, instance=order)
+        form = OrderForm(request.POST, instance=order, near=near)
         if form.is_valid():
             form.save()
             messages.success(request, f'Заказ #{order.order_number} успешно обновлен')
             return redirect('shop:orders_list')
     else:
-        form = OrderForm(instance=order)
+        form = OrderForm(instance=order, near=near)
+    
+    # Рекомендации к заказу берутся из индекса в памяти, из БД - только названия
+    articles = [item.product_id for item in order.items.all()]
+    recommended = related_to_order(articles, k=5)
+    recommended_products = Product.objects.in_bulk(recommended)
     
     context = {
         'form': form,
         'order': order,
         'profile': profile,
         'is_edit': True,
+        'recommended_products': [recommended_products[a] for a in recommended if a in recommended_products],
     }
     
     return render(request, 'shop/order_form.html', context)
@@ -333,6 +497,56 @@ def delete_order(request, order_id):
     return render(request, 'shop/order_confirm_delete.html', context)
 
 
+@login_required(login_url='shop:login')
+def delivery_points_nearest(request):
+    """Ближайшие пункты выдачи к почтовому индексу или координатам (JSON)"""
+    location = _location_from_request(request)
+    if location is None:
+        return JsonResponse({'error': 'Укажите postcode или lat и lon'}, status=400)
+    
+    try:
+        limit = min(int(request.GET.get('n', 5)), 100)
+    except ValueError:
+        limit = 5
+    
+    nearest = nearest_delivery_points(limit, **location)
+    addresses = DeliveryPoint.objects.in_bulk([point_id for point_id, _ in nearest])
+    
+    return JsonResponse({
+        'points': [
+            {
+                'id': point_id,
+                'address': addresses[point_id].address,
+                'distance_km': round(distance, 2),
+            }
+            for point_id, distance in nearest if point_id in addresses
+        ],
+    })
+
+
+@login_required(login_url='shop:login')
+def lookup(request, name):
+    """Поиск по справочнику для полей с поиском по мере ввода (JSON, только для администратора)"""
+    try:
+        profile = request.user.profile
+    except UserProfile.DoesNotExist:
+        profile = None
+    
+    # Поля с поиском есть только в формах администратора
+    if profile is None or profile.role != 'admin':
+        return JsonResponse({'error': 'Нет доступа'}, status=403)
+    
+    provider = get_provider(name)
+    if provider is None:
+        return JsonResponse({'error': 'Неизвестный справочник'}, status=404)
+    
+    results = provider.search(request.GET.get('q', ''), limit=20)
+    
+    return JsonResponse({
+        'results': [{'id': pk, 'text': label} for pk, label in results],
+    })
+
+
 def logout_view(request):
     """Выход пользователя"""
     logout(request)